@@ -0,0 +1,66 @@
+import importlib
+import sys
+import time
+
+import streamlit as st
+
+from tracing import record_startup
+
+# Single entry point serving every league from one process:
+#
+#     streamlit run app.py
+#     http://host:8501/?provider=sleeper&page=weekly&league=1125204823692955648
+#
+# Each session picks its provider, page and league; the player index and the
+# per-league caches are shared by all of them (see league_cache.py).
+
+# (provider, page) -> module whose main() renders it; imported on first use so an
+# ESPN-less deployment never needs espn_api or ESPN secrets
+PAGES = {
+    ("Sleeper", "Weekly roasts"): "sleep",
+    ("Sleeper", "Season recaps"): "final_2025",
+    ("ESPN", "Weekly roasts"): "espn",
+}
+
+PROVIDERS = ["Sleeper", "ESPN"]
+
+
+# Function to read a sidebar choice from a query parameter, defaulting to the first option
+def _query_choice(name, options):
+    value = st.query_params.get(name, "").lower()
+    for index, option in enumerate(options):
+        if option.lower().split()[0] == value:
+            return index
+    return 0
+
+
+# A league ID only makes sense for the provider it was entered for
+def _forget_league():
+    st.query_params.pop("league", None)
+
+
+def main():
+    run_start = time.perf_counter()
+    provider = st.sidebar.radio(
+        "Provider", PROVIDERS, index=_query_choice("provider", PROVIDERS), on_change=_forget_league
+    )
+    pages = [page for page_provider, page in PAGES if page_provider == provider]
+    page = st.sidebar.radio("Page", pages, index=_query_choice("page", pages))
+    st.query_params["provider"] = provider.lower()
+    st.query_params["page"] = page.lower().split()[0]
+
+    # Page modules are imported on first use, so the first viewer of each page pays for
+    # its imports; both that and the page's first full run are kept as start-up timings
+    module_name = PAGES[(provider, page)]
+    first_use = module_name not in sys.modules
+    import_start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if first_use:
+        record_startup(f"import.{module_name}", time.perf_counter() - import_start)
+    module.main()
+    if first_use:
+        record_startup(f"first_run.{module_name}", time.perf_counter() - run_start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import html
+import json
+import os
+import time
+
+from models import MatchupTeam
+
+# Directory holding precomputed pages, one subdirectory per league
+ARTIFACT_DIR = "artifacts"
+
+# Bumped whenever the artifact layout changes; older artifacts are ignored
+ARTIFACT_VERSION = 1
+
+
+def _artifact_path(league_id, name, extension):
+    return os.path.join(ARTIFACT_DIR, str(league_id), f"{name}.v{ARTIFACT_VERSION}.{extension}")
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# Function to write an artifact's JSON payload (and optional HTML rendering)
+def write_artifact(league_id, name, payload, html_text=None):
+    document = {
+        "version": ARTIFACT_VERSION,
+        "league_id": str(league_id),
+        "name": name,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **payload,
+    }
+    path = _artifact_path(league_id, name, "json")
+    _write_atomic(path, json.dumps(document, ensure_ascii=False, indent=2))
+    if html_text is not None:
+        _write_atomic(_artifact_path(league_id, name, "html"), html_text)
+    return path
+
+
+# Function to load an artifact's JSON payload, or None when missing or from another version
+def load_artifact(league_id, name):
+    try:
+        with open(_artifact_path(league_id, name, "json"), "r", encoding="utf-8") as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if document.get("version") != ARTIFACT_VERSION:
+        return None
+    return document
+
+
+def week_artifact_name(week):
+    return f"week_{int(week):02d}"
+
+
+SEASON_ARTIFACT_NAME = "season"
+
+
+def _render_html(title, sections):
+    body = "\n".join(sections)
+    return (
+        "<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(title)}</title></head>\n<body>\n<h1>{html.escape(title)}</h1>\n{body}\n</body>\n</html>\n"
+    )
+
+
+def _render_image(url, caption=""):
+    if not url:
+        return ""
+    return f"<img src=\"{html.escape(url)}\" width=\"100\" alt=\"{html.escape(caption)}\">"
+
+
+# Function to write a week's matchups and roasts
+def write_week_artifact(league_id, week, matchups, roasts, is_championship=False):
+    sections = []
+    for roast in roasts:
+        teams = matchups.get(roast['matchup_id'], [])
+        header = " vs ".join(f"{team.team_name} ({team.points})" for team in teams)
+        logos = " ".join(_render_image(team.avatar, team.team_name) for team in teams)
+        sections.append(
+            f"<h3>{html.escape(header)}</h3>\n<p>{logos}</p>\n"
+            f"<p><strong>Roast:</strong> {html.escape(roast['roast'])}</p>"
+        )
+
+    payload = {
+        "week": int(week),
+        "is_championship": is_championship,
+        "matchups": [
+            {"matchup_id": matchup_id, "teams": [team.to_dict() for team in teams]}
+            for matchup_id, teams in matchups.items()
+        ],
+        "roasts": roasts,
+    }
+    return write_artifact(league_id, week_artifact_name(week), payload, _render_html(f"Week {week} Roasts", sections))
+
+
+# Function to load a week's precomputed matchups and roasts, as (matchups, roasts, generated_at)
+def load_week_artifact(league_id, week):
+    document = load_artifact(league_id, week_artifact_name(week))
+    if document is None:
+        return None
+    matchups = {
+        entry["matchup_id"]: [MatchupTeam.from_dict(team) for team in entry["teams"]]
+        for entry in document["matchups"]
+    }
+    return matchups, document["roasts"], document["generated_at"]
+
+
+# Function to write the season recaps
+def write_season_artifact(league_id, recaps):
+    sections = [
+        f"<h3>Season Recap for {html.escape(str(recap['owner']))}</h3>\n"
+        f"<p>{_render_image(recap.get('avatar'), str(recap['owner']))}</p>\n"
+        f"<p>{html.escape(recap['recap'])}</p>"
+        for recap in recaps
+    ]
+    return write_artifact(league_id, SEASON_ARTIFACT_NAME, {"recaps": recaps}, _render_html("Season Recaps", sections))
+
+
+# Function to load the precomputed season recaps, as (recaps, generated_at)
+def load_season_artifact(league_id):
+    document = load_artifact(league_id, SEASON_ARTIFACT_NAME)
+    if document is None:
+        return None
+    return document["recaps"], document["generated_at"]
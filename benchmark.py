@@ -0,0 +1,238 @@
+import argparse
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# End-to-end latency benchmark for the pages, run offline against replay fixtures
+# (see replay.py). Each scenario drives a page's main() through Streamlit's AppTest
+# in a fresh subprocess and working directory, once cold and once warm, and reports
+# the page module's import time, wall time, calls per external service and peak RSS.
+# Results are compared with a stored baseline and the command exits non-zero when a
+# scenario regresses.
+#
+#     python benchmark.py --record                  # capture fixtures from the live services
+#     python benchmark.py --record --synthetic      # capture them from loadtest.py's stub league
+#     python benchmark.py --update-baseline         # store the current numbers
+#     python benchmark.py                           # compare against the baseline
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = os.path.join(REPO_DIR, "fixtures", "default")
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmark_baseline.json")
+
+# Allowed slowdown and memory growth over the baseline before a scenario fails
+DEFAULT_TIME_TOLERANCE = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.15
+
+# Absolute slowdown always allowed, so sub-second warm runs don't fail on scheduler noise
+TIME_SLACK_S = 0.05
+
+# Size of the stub league recorded by --synthetic (the shipped fixtures/default)
+SYNTHETIC_TEAMS = 10
+SYNTHETIC_ROSTER_SIZE = 16
+
+# Seconds AppTest waits for a single page run
+APPTEST_TIMEOUT = 300
+
+SCENARIOS = {
+    "sleep.week": "import sleep\nsleep.main()\n",
+    "final_2025.season": "import final_2025\nfinal_2025.main()\n",
+    "espn.week": "import espn\nespn.main()\n",
+}
+
+
+def _load_secrets(fixtures, mode, synthetic=False):
+    secrets_path = os.path.join(REPO_DIR, ".streamlit", "secrets.toml")
+    if not synthetic and (mode == "record" or os.path.exists(secrets_path)):
+        import tomllib
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f)
+
+    # Replay (and the stub) never check keys, so only the league the fixtures were recorded for matters
+    secrets = {"openai": {"api_key": "replay"}, "giphy": {"api_key": "replay"}}
+    try:
+        with open(os.path.join(fixtures, "espn.json"), "r", encoding="utf-8") as f:
+            league_id, year = next(iter(json.load(f))).split(":")
+        secrets["espn"] = {"league_id": int(league_id), "year": int(year), "espn_s2": "", "swid": ""}
+    except (OSError, ValueError, StopIteration):
+        pass
+    return secrets
+
+
+# Function to drive one page run through AppTest, returning the errors it showed
+def _drive(name, script, secrets, week):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_string(script, default_timeout=APPTEST_TIMEOUT)
+    for section, values in secrets.items():
+        at.secrets[section] = values
+    at.run()
+    if name in ("sleep.week", "espn.week"):
+        # A page that failed (e.g. a ReplayMiss on missing fixtures) never draws its week selector
+        errors = _page_errors(at)
+        if errors or not at.selectbox:
+            return errors or ["page rendered no week selector"]
+    if name == "sleep.week":
+        at.selectbox[0].select(f"Week {week}").run()
+    elif name == "espn.week":
+        at.selectbox[0].select(f"NFL Week {week}").run()
+        at.button[0].click().run()
+    return _page_errors(at)
+
+
+def _page_errors(at):
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+
+# Function to run one scenario in this process (the benchmark's child side)
+def run_scenario(name, fixtures, mode, latency, week, synthetic=False):
+    sys.path.insert(0, REPO_DIR)
+    import replay
+
+    if name == "espn.week" and synthetic:
+        return {"scenario": name, "skipped": "the stub league has no ESPN counterpart"}
+    if name == "espn.week":
+        try:
+            import espn_api  # noqa: F401
+        except ImportError:
+            return {"scenario": name, "skipped": "espn_api is not installed"}
+
+    session = None
+    if synthetic and mode == "record":
+        import loadtest
+        import openai
+
+        _, stub_url = loadtest.start_stub_server(loadtest.build_league(SYNTHETIC_TEAMS, SYNTHETIC_ROSTER_SIZE), {})
+        session = loadtest.StubSession(stub_url)
+        openai.api_base = f"{stub_url}/openai/v1"
+    recorder = replay.install(fixtures, mode=mode, latency=latency, session=session)
+    secrets = _load_secrets(fixtures, mode, synthetic)
+    result = {"scenario": name}
+    # Import the page on its own first, so its start-up cost is visible apart from the cold run
+    start = time.perf_counter()
+    importlib.import_module(name.split(".")[0])
+    result["import_s"] = round(time.perf_counter() - start, 3)
+    for phase in ("cold", "warm"):
+        recorder.reset_counts()
+        start = time.perf_counter()
+        errors = _drive(name, SCENARIOS[name], secrets, week)
+        result[phase] = {
+            "wall_s": round(time.perf_counter() - start, 3),
+            "calls": dict(recorder.calls),
+            "errors": errors,
+        }
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+# Function to run a scenario in a fresh subprocess and working directory
+def _run_isolated(name, args):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        command = [
+            sys.executable, os.path.abspath(__file__), "--child", name,
+            "--fixtures", os.path.abspath(args.fixtures), "--week", str(args.week),
+            "--latency", json.dumps(args.latency),
+        ] + (["--record"] if args.record else []) + (["--synthetic"] if args.synthetic else [])
+        completed = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"scenario": name, "failed": completed.stderr.strip().splitlines()[-1:] or ["exited non-zero"]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# Function to list how `result` regressed against `baseline`
+def compare(result, baseline, time_tolerance, memory_tolerance):
+    problems = []
+    if "failed" in result:
+        return [f"failed: {result['failed']}"]
+    if baseline.get("import_s") and result["import_s"] > baseline["import_s"] * (1 + time_tolerance) + TIME_SLACK_S:
+        problems.append(f"import: {result['import_s']}s vs baseline {baseline['import_s']}s")
+    for phase in ("cold", "warm"):
+        current, before = result[phase], baseline.get(phase, {})
+        if current["errors"]:
+            problems.append(f"{phase}: page showed errors {current['errors'][:3]}")
+        if before.get("wall_s") and current["wall_s"] > before["wall_s"] * (1 + time_tolerance) + TIME_SLACK_S:
+            problems.append(f"{phase}: {current['wall_s']}s vs baseline {before['wall_s']}s")
+        for service, count in current["calls"].items():
+            if count > before.get("calls", {}).get(service, 0):
+                problems.append(f"{phase}: {count} {service} calls vs baseline {before.get('calls', {}).get(service, 0)}")
+    if baseline.get("peak_rss_mb") and result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + memory_tolerance):
+        problems.append(f"peak RSS {result['peak_rss_mb']} MB vs baseline {baseline['peak_rss_mb']} MB")
+    return problems
+
+
+def _parse_latency(text):
+    if not text:
+        return {}
+    if text.lstrip().startswith("{"):
+        return json.loads(text)
+    return {service: float(seconds) for service, seconds in (item.split("=") for item in text.split(","))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pages offline against recorded fixtures.")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="fixture directory to record into or replay from")
+    parser.add_argument("--record", action="store_true", help="call the live services and (re)record fixtures")
+    parser.add_argument("--synthetic", action="store_true", help="with --record, record from loadtest.py's stub league instead")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="scenario to run (repeatable); defaults to all")
+    parser.add_argument("--week", type=int, default=3, help="week the weekly pages render")
+    parser.add_argument("--latency", type=_parse_latency, default={}, help="injected latency per service, e.g. openai=1.5,sleeper=0.1")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results file")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    mode = "record" if args.record else "replay"
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.fixtures, mode, args.latency, args.week, args.synthetic)))
+        return 0
+
+    if mode == "replay" and not os.path.exists(os.path.join(args.fixtures, "http.json")):
+        print(f"No fixtures in {args.fixtures}; record them with --record (or --record --synthetic).", file=sys.stderr)
+        return 1
+
+    try:
+        with open(args.baseline, "r") as f:
+            baselines = json.load(f)
+    except (OSError, ValueError):
+        baselines = {}
+
+    regressed = False
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        result = _run_isolated(name, args)
+        if "skipped" in result:
+            print(f"{name}: skipped ({result['skipped']})")
+            continue
+        results[name] = result
+        if "failed" in result:
+            print(f"{name}: FAILED {result['failed']}")
+            regressed = True
+            continue
+        print(
+            f"{name}: import {result['import_s']}s, cold {result['cold']['wall_s']}s {result['cold']['calls']}, "
+            f"warm {result['warm']['wall_s']}s {result['warm']['calls']}, peak RSS {result['peak_rss_mb']} MB"
+        )
+        if args.record or args.update_baseline:
+            continue
+        problems = compare(result, baselines.get(name, {}), args.time_tolerance, args.memory_tolerance)
+        for problem in problems:
+            print(f"  REGRESSION {problem}")
+        regressed = regressed or bool(problems)
+
+    if args.update_baseline and not regressed:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.baseline}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,92 +1,170 @@
 import streamlit as st
-from espn_api.football import League
-import openai
+from image_cache import prefetch_thumbnails, thumbnail
+from league_cache import league_cached, refresh_league_button, register_league_cache, select_league
+from models import Matchup, MatchupTeam
+from roast_engine import configure_openai, generate_completion, run_bounded
+from tracing import collect_spans, profiler_sidebar, span
 
-# Fetch settings from secrets.toml
-LEAGUE_ID = st.secrets["espn"]["league_id"]
-YEAR = st.secrets["espn"]["year"]
-ESPN_S2 = st.secrets["espn"]["espn_s2"]
-SWID = st.secrets["espn"]["swid"]
+# How long a League handle is reused before settings, teams and the current week are reloaded
+LEAGUE_TTL = 6 * 60 * 60
 
-# OpenAI API Key
-openai.api_key = st.secrets["openai"]["api_key"]
+# Number of League handles kept at once when serving several leagues
+LEAGUE_MAX_ENTRIES = 32
+
+# Seconds a scoreboard for a week still in progress is reused
+LIVE_SCOREBOARD_TTL = 60
+
+# System persona used for matchup roasts
+ROAST_SYSTEM_MESSAGE = "You are a witty sports commentator."
+
+# Function to get a long-lived League handle per (league, year, credentials), shared across sessions
+@register_league_cache
+@st.cache_resource(ttl=LEAGUE_TTL, max_entries=LEAGUE_MAX_ENTRIES, show_spinner=False)
+def get_league(league_id, year, espn_s2, swid):
+    # espn_api is only imported once an ESPN league is actually loaded
+    from espn_api.football import League
+
+    return League(league_id=league_id, year=year, espn_s2=espn_s2, swid=swid)
+
+# Completed weeks can no longer change, so they are kept until evicted
+def _scoreboard_ttl(scoreboard):
+    return None if scoreboard[1] else LIVE_SCOREBOARD_TTL
+
+# Function to turn one side of an espn_api matchup into a MatchupTeam ("N/A" on a bye)
+def _matchup_team(team, score):
+    if not team:
+        return MatchupTeam(None, "N/A", points=score)
+    return MatchupTeam(team.team_id, team.team_name, avatar=team.logo_url or None, points=score)
+
+# Function to fetch a week's scoreboard as (matchups, is_final), shared across sessions.
+# Only the fields the page shows are kept, not espn_api's full Team and roster objects.
+@league_cached(ttl=_scoreboard_ttl)
+def load_scoreboard(league_id, year, week, espn_s2=None, swid=None):
+    league = get_league(league_id, year, espn_s2, swid)
+    matchups = [
+        Matchup(
+            matchup_id,
+            (_matchup_team(matchup.home_team, matchup.home_score), _matchup_team(matchup.away_team, matchup.away_score)),
+            is_playoff=getattr(matchup, "is_playoff", False),
+        )
+        for matchup_id, matchup in enumerate(league.scoreboard(week=week))
+    ]
+    current_period = getattr(league, "currentMatchupPeriod", league.current_week)
+    return matchups, week < current_period
+
+# Function to pick the ESPN cookies sent for a league. The deployer's espn_s2/swid only go
+# to the configured league and any listed in [espn] private_league_ids; every other
+# league is loaded without credentials, so only public leagues can be viewed.
+def league_credentials(espn_secrets, league_id):
+    allowed = {str(espn_secrets["league_id"])}
+    allowed.update(str(private_id) for private_id in espn_secrets.get("private_league_ids", []))
+    if str(league_id) in allowed:
+        return espn_secrets["espn_s2"], espn_secrets["swid"]
+    return None, None
 
 # Function to fetch matchups
 def fetch_matchups(league_id, year, espn_s2, swid, week):
     try:
-        league = League(league_id=league_id, year=year, espn_s2=espn_s2, swid=swid)
-        matchups = league.scoreboard(week=week)
+        with span("espn.scoreboard", league=league_id, week=week):
+            matchups, _ = load_scoreboard(league_id, year, week, espn_s2=espn_s2, swid=swid)
         return matchups
     except Exception as e:
         st.error(f"Error fetching matchups: {e}")
         return None
 
-# Function to generate roasts using OpenAI
-def generate_roast(home_team, home_score, away_team, away_score, is_playoff=False):
+# Function to generate roasts using OpenAI, streaming partial text to `on_text` if given
+def generate_roast(home_team, home_score, away_team, away_score, is_playoff=False, on_text=None):
     try:
         playoff_text = " in the playoffs" if is_playoff else ""
         prompt = f"""Write a funny and sarcastic roast for a fantasy football matchup{playoff_text}:
 Home Team: {home_team} (Score: {home_score})
 Away Team: {away_team} (Score: {away_score})
 Make it witty and fun!"""
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a witty sports commentator."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message["content"]
+        return generate_completion(ROAST_SYSTEM_MESSAGE, prompt, on_text=on_text)
     except Exception as e:
         st.error(f"Error generating roast: {e}")
         return "Error generating roast."
 
-# Streamlit interface
-st.title("Fantasy Football Matchup Roaster 🏈🔥")
-
-# Week selection dropdown
-weeks = [f"NFL Week {i}" for i in range(1, 15)] + [
-    "Playoff Round 1 (NFL Week 15 - NFL Week 16)",
-    "Playoff Round 2 (NFL Week 17 - NFL Week 18)"
-]
-selected_week = st.selectbox("Select Week", weeks)
-
-if st.button("Generate Roasts"):
-    with st.spinner("Fetching matchups and generating roasts..."):
-        # Determine if this is a playoff round
-        if "Playoff Round" in selected_week:
-            week = int(selected_week.split("NFL Week ")[-1][:2])
-            is_playoff = True
-        else:
-            week = int(selected_week.split("NFL Week ")[-1])
-            is_playoff = False
-
-        matchups = fetch_matchups(LEAGUE_ID, YEAR, ESPN_S2, SWID, week)
-
-        if matchups:
-            st.subheader(f"Matchups for {selected_week}")
-            for matchup in matchups:
-                # Extract team details
-                home_team = matchup.home_team.team_name if matchup.home_team else "N/A"
-                away_team = matchup.away_team.team_name if matchup.away_team else "N/A"
-                home_score = matchup.home_score
-                away_score = matchup.away_score
-                home_logo = matchup.home_team.logo_url if matchup.home_team and matchup.home_team.logo_url else None
-                away_logo = matchup.away_team.logo_url if matchup.away_team and matchup.away_team.logo_url else None
-                is_playoff_matchup = getattr(matchup, "is_playoff", False)
-
-                # Generate roast
-                roast = generate_roast(home_team, home_score, away_team, away_score, is_playoff=is_playoff_matchup)
-
-                # Display matchup details with logos
-                st.markdown(f"### {home_team} ({home_score}) vs {away_team} ({away_score})")
-                cols = st.columns(2)
-                with cols[0]:
-                    if home_logo:
-                        st.image(home_logo, width=100, caption=home_team)
-                with cols[1]:
-                    if away_logo:
-                        st.image(away_logo, width=100, caption=away_team)
-
-                # Display the roast
-                st.write(roast)
\ No newline at end of file
+# Main function to run the app
+def main():
+    with collect_spans() as spans:
+        render_roaster()
+    profiler_sidebar(spans)
+
+# Function to render the roaster page
+def render_roaster():
+    st.title("Fantasy Football Matchup Roaster 🏈🔥")
+    espn_secrets = st.secrets["espn"]
+    # The league in secrets.toml is shown when the session has not picked one
+    league_id = select_league(espn_secrets["league_id"])
+    if league_id is None:
+        return
+    league_id = int(league_id)
+    espn_s2, swid = league_credentials(espn_secrets, league_id)
+    refresh_league_button(league_id)
+    max_in_flight = configure_openai()
+
+    # Week selection dropdown
+    weeks = [f"NFL Week {i}" for i in range(1, 15)] + [
+        "Playoff Round 1 (NFL Week 15 - NFL Week 16)",
+        "Playoff Round 2 (NFL Week 17 - NFL Week 18)"
+    ]
+    selected_week = st.selectbox("Select Week", weeks)
+
+    if st.button("Generate Roasts"):
+        with st.spinner("Fetching matchups and generating roasts..."):
+            # Determine if this is a playoff round
+            if "Playoff Round" in selected_week:
+                week = int(selected_week.split("NFL Week ")[-1][:2])
+                is_playoff = True
+            else:
+                week = int(selected_week.split("NFL Week ")[-1])
+                is_playoff = False
+
+            matchups = fetch_matchups(league_id, espn_secrets["year"], espn_s2, swid, week)
+
+            if matchups:
+                st.subheader(f"Matchups for {selected_week}")
+                prefetch_thumbnails(team.avatar for matchup in matchups for team in matchup.teams)
+                placeholders = []
+                for matchup in matchups:
+                    # Extract team details
+                    home, away = matchup.teams
+                    home_team, home_score, home_logo = home.team_name, home.points, home.avatar
+                    away_team, away_score, away_logo = away.team_name, away.points, away.avatar
+
+                    # Display matchup details with logos
+                    st.markdown(f"### {home_team} ({home_score}) vs {away_team} ({away_score})")
+                    cols = st.columns(2)
+                    with cols[0]:
+                        if home_logo:
+                            st.image(thumbnail(home_logo), width=100, caption=home_team)
+                    with cols[1]:
+                        if away_logo:
+                            st.image(thumbnail(away_logo), width=100, caption=away_team)
+
+                    # Placeholder the roast streams into once generation starts
+                    placeholder = st.empty()
+                    placeholder.write("_Warming up the mic..._")
+                    placeholders.append(placeholder)
+
+                def roast_matchup(job):
+                    matchup, placeholder = job
+                    home, away = matchup.teams
+                    roast = generate_roast(
+                        home.team_name,
+                        home.points,
+                        away.team_name,
+                        away.points,
+                        is_playoff=matchup.is_playoff,
+                        on_text=placeholder.write,
+                    )
+                    # Display the roast
+                    placeholder.write(roast)
+
+                # Generate roasts concurrently, filling matchups in whichever order they finish
+                run_bounded(roast_matchup, list(zip(matchups, placeholders)), max_in_flight=max_in_flight)
+
+# Run the app
+if __name__ == "__main__":
+    main()
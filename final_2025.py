@@ -1,195 +1,210 @@
 import streamlit as st
-import openai
-import requests
-import os
-import json
-import random
-from sleeper.api import (
-    get_matchups_for_week,
-    get_rosters,
-    get_users_in_league,
+from artifacts import load_season_artifact
+from gif_pool import fetch_random_gif, giphy_api_key, prefetch_gif_pools
+from image_cache import prefetch_thumbnails, thumbnail
+from league_cache import (
+    get_team_mapping_with_players,
+    load_player_index,
+    refresh_league_button,
+    select_league,
 )
-
-# Access the OpenAI API key from secrets.toml
-api_key = st.secrets["openai"]["api_key"]
-openai.api_key = api_key
-
-# Giphy API Key
-GIPHY_API_KEY = st.secrets.get("giphy", {}).get("api_key", None)
-
-# Set your Sleeper league ID
+from models import get_player
+from roast_engine import MAX_IN_FLIGHT, configure_openai, generate_batch, generate_completion, run_bounded
+from season_stats import SeasonTable
+from single_flight import single_flight
+from sleeper_client import get_matchups_for_week, get_nfl_state
+from tracing import collect_spans, profiler_sidebar, span
+from week_store import WeekStore
+
+# Sleeper league shown when the session has not picked one
 LEAGUE_ID = "1125204823692955648"
 
-# Path to the player cache file
-PLAYER_CACHE_FILE = "players_cache.json"
+# Weeks covered by the season recap
+SEASON_WEEKS = list(range(1, 18))
 
-def fetch_and_cache_players():
-    if os.path.exists(PLAYER_CACHE_FILE):
-        try:
-            with open(PLAYER_CACHE_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            st.warning(f"Cache file corrupted. Re-fetching player data. Error: {e}")
-
-    response = requests.get("https://api.sleeper.app/v1/players/nfl")
-    if response.status_code == 200:
-        player_data = response.json()
-        with open(PLAYER_CACHE_FILE, "w") as f:
-            json.dump(player_data, f)
-        return player_data
-    else:
-        st.error(f"Error fetching player data: {response.status_code}")
-        return {}
+# Maximum number of concurrent Sleeper matchup requests during the season backfill
+SLEEPER_MAX_IN_FLIGHT = 6
 
-def fetch_avatar(avatar_id):
-    if avatar_id:
-        return f"https://sleepercdn.com/avatars/{avatar_id}"
-    return "https://via.placeholder.com/150.png?text=No+Avatar"
+# System persona used for season recaps
+RECAP_SYSTEM_MESSAGE = "You are Chris Berman, a witty and humorous sports commentator."
 
-def fetch_random_gif(query="nfl celebration"):
-    if not GIPHY_API_KEY:
-        return "https://via.placeholder.com/300x200.png?text=No+GIF+Available"
+# Function to fetch the NFL state (current week and season type) from Sleeper
+def fetch_nfl_state():
     try:
-        url = f"https://api.giphy.com/v1/gifs/search?api_key={GIPHY_API_KEY}&q={query}&limit=10&offset=0&rating=g&lang=en"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            gifs = [gif["images"]["original"]["url"] for gif in data.get("data", [])]
-            return random.choice(gifs) if gifs else "https://via.placeholder.com/300x200.png?text=No+GIFs"
-        else:
-            return "https://via.placeholder.com/300x200.png?text=GIF+Fetch+Error"
-    except Exception:
-        return "https://via.placeholder.com/300x200.png?text=GIF+Error"
-
-def get_team_mapping_with_players(player_data):
-    try:
-        league_users = get_users_in_league(league_id=LEAGUE_ID)
-        league_rosters = get_rosters(league_id=LEAGUE_ID)
-
-        user_mapping = {
-            user["user_id"]: {
-                "name": user.get("display_name", f"User {user['user_id']}"),
-                "avatar": fetch_avatar(user.get("avatar")),
-            }
-            for user in league_users
-        }
-
-        team_mapping = {}
-        for roster in league_rosters:
-            players = {
-                player_id: {
-                    "details": player_data.get(player_id, {"name": "Unknown Player"}),
-                    "points": 0  # Initialize points for this player
-                }
-                for player_id in roster.get("players", [])
-            }
-            team_mapping[roster["roster_id"]] = {
-                "team_name": roster.get("metadata", {}).get(
-                    "team_name",
-                    user_mapping.get(roster["owner_id"], {}).get("name", f"Team {roster['roster_id']}")
-                ),
-                "avatar": user_mapping.get(roster["owner_id"], {}).get("avatar"),
-                "owner": user_mapping.get(roster["owner_id"], {}).get("name"),
-                "total_points": 0,
-                "players": players,
-            }
-        return team_mapping
+        return get_nfl_state()
     except Exception as e:
-        st.error(f"Error fetching league rosters or users: {e}")
-        return {}
+        print(f"Error fetching NFL state: {e}")
+    return {}
+
+# Function to work out the last week whose scores can no longer change
+def get_last_final_week(nfl_state):
+    season_type = nfl_state.get("season_type")
+    if season_type in ("off", "post"):
+        return SEASON_WEEKS[-1]
+    if season_type == "regular":
+        return int(nfl_state.get("week", 1)) - 1
+    return 0
+
+# Function to load every week of the season, reading finalized weeks from the
+# week store and fetching only the remaining weeks concurrently
+def load_season_matchups(weeks=SEASON_WEEKS, league_id=LEAGUE_ID):
+    week_store = WeekStore(league_id)
+    season = {week: week_store.load(week) for week in week_store.stored_weeks() if week in weeks}
+    missing_weeks = [week for week in weeks if season.get(week) is None]
+    if not missing_weeks:
+        return season
+
+    nfl_state = fetch_nfl_state()
+    last_final_week = get_last_final_week(nfl_state)
+    if nfl_state.get("season_type") == "regular":
+        # Weeks that have not kicked off yet have nothing to score
+        current_week = int(nfl_state.get("week", SEASON_WEEKS[-1]))
+        missing_weeks = [week for week in missing_weeks if week <= current_week]
+
+    def fetch_week(week):
+        try:
+            with span("sleeper.matchups", league=league_id, week=week):
+                return get_matchups_for_week(league_id=league_id, week=week)
+        except Exception as e:
+            print(f"Error fetching matchups for week {week}: {e}")
+            return None
 
-def get_matchups_with_teams(week, team_mapping):
-    try:
-        matchups = get_matchups_for_week(league_id=LEAGUE_ID, week=week)
+    fetched = run_bounded(fetch_week, missing_weeks, max_in_flight=SLEEPER_MAX_IN_FLIGHT)
+    for week, matchups in zip(missing_weeks, fetched):
         if not matchups or not isinstance(matchups, list):
-            st.error(f"No valid matchups returned for week {week}.")
-            return {}
-
-        for matchup in matchups:
-            roster_id = matchup.get('roster_id')
-            points = matchup.get('points', 0)
-            starters = matchup.get('starters', [])
-
-            if roster_id is None:
-                continue
-
-            team_data = team_mapping.get(roster_id)
-            if team_data:
-                team_data["total_points"] += points
-
-                for player_id in starters:
-                    if player_id in team_data["players"]:
-                        team_data["players"][player_id]["points"] += points  # Accumulate points per player
-
-        return team_mapping
-    except Exception as e:
-        st.error(f"Error fetching matchups for week {week}: {e}")
-        return {}
-
-def generate_user_recaps(team_mapping):
-    recaps = []
+            continue
+        season[week] = matchups
+        if week <= last_final_week:
+            week_store.save(week, matchups)
+    return dict(sorted(season.items()))
+
+def generate_user_recaps(team_mapping, season_table, player_index,
+                         max_in_flight=MAX_IN_FLIGHT, force_refresh=False, batch=False):
+    jobs = []
     for roster_id, team_data in team_mapping.items():
-        top_players = sorted(
-            team_data["players"].items(),
-            key=lambda item: item[1]["points"],
-            reverse=True
-        )[:3]  # Get top 3 players
-
+        # Top 3 starters by the points they actually scored for this team
         top_players_text = ", ".join(
-            f"{player['details'].get('full_name', player_id)} ({player['points']} pts)"
-            for player_id, player in top_players
+            f"{get_player(player_index, player_id).name} ({points} pts)"
+            for player_id, points in season_table.top_players(roster_id, 3)
         )
 
+        best_week, worst_week = season_table.best_and_worst_week(roster_id)
+        weeks_text = ""
+        if best_week and worst_week:
+            weeks_text = (
+                f"Best week was week {best_week[0]} with {best_week[1]} points; "
+                f"worst week was week {worst_week[0]} with {worst_week[1]} points.\n"
+            )
+
         prompt = (
-            f"Fantasy Football Season Recap for {team_data['owner']}:\n"
-            f"The team, {team_data['team_name']}, scored a total of {team_data['total_points']} points.\n"
+            f"Fantasy Football Season Recap for {team_data.owner}:\n"
+            f"The team, {team_data.team_name}, scored a total of {season_table.season_total(roster_id)} points.\n"
             f"Top players were: {top_players_text}.\n"
+            f"{weeks_text}"
             "Highlight this team's best performances and any embarrassing failures, "
             "providing a humorous season commentary in Chris Berman's style."
         )
 
-        print(f"Generated recap prompt for {team_data['owner']}:\n{prompt}\n")
+        print(f"Generated recap prompt for {team_data.owner}:\n{prompt}\n")
+        jobs.append((roster_id, prompt))
 
+    def recap_team(job):
+        roster_id, prompt = job
+        team_data = team_mapping[roster_id]
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are Chris Berman, a witty and humorous sports commentator."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            recap_text = response["choices"][0]["message"]["content"].strip()
-            recaps.append({'owner': team_data['owner'], 'recap': recap_text, 'avatar': team_data["avatar"]})
+            recap_text = generate_completion(RECAP_SYSTEM_MESSAGE, prompt, force_refresh=force_refresh)
+            return {'owner': team_data.owner, 'recap': recap_text, 'avatar': team_data.avatar}
         except Exception as e:
-            recaps.append({'owner': team_data['owner'], 'recap': f"Error generating recap: {str(e)}", 'avatar': team_data["avatar"]})
+            return {'owner': team_data.owner, 'recap': f"Error generating recap: {str(e)}", 'avatar': team_data.avatar, 'error': True}
 
-    return recaps
+    batch_recaps = {}
+    if batch:
+        # One request for the whole league; anything missing or malformed is recapped individually below
+        try:
+            batch_recaps = generate_batch(RECAP_SYSTEM_MESSAGE, jobs, "roster_id", "recap", force_refresh=force_refresh)
+        except Exception as e:
+            print(f"Batch recap request failed, falling back to per-team calls: {e}")
+
+    # Generate remaining recaps concurrently; results come back in team order
+    remaining = run_bounded(
+        recap_team, [job for job in jobs if job[0] not in batch_recaps], max_in_flight=max_in_flight
+    )
+    recaps = dict(zip([job[0] for job in jobs if job[0] not in batch_recaps], remaining))
+    return [
+        recaps.get(roster_id) or {
+            'owner': team_mapping[roster_id].owner,
+            'recap': batch_recaps[roster_id],
+            'avatar': team_mapping[roster_id].avatar,
+        }
+        for roster_id, _ in jobs
+    ]
 
 def display_user_recaps(recaps):
+    used_gifs = set()
+    prefetch_thumbnails(recap['avatar'] for recap in recaps)
     for recap in recaps:
         st.markdown(f"### Season Recap for {recap['owner']}")
         if recap['avatar']:
-            st.image(recap['avatar'], width=100)
+            st.image(thumbnail(recap['avatar']), width=100)
         st.markdown(recap['recap'])
-        gif_url = fetch_random_gif(query=f"nfl celebration")
+        gif_url = fetch_random_gif(query="nfl celebration", used=used_gifs)
         st.image(gif_url, use_column_width=True)
 
 def main():
+    with collect_spans() as spans:
+        render_recaps()
+    profiler_sidebar(spans)
+
+def render_recaps():
     st.title("Fantasy Football User Season Recaps 🏈🔥")
+    league_id = select_league(LEAGUE_ID)
+    if league_id is None:
+        return
+    refresh_league_button(league_id)
+    max_in_flight = configure_openai()
+
+    # Skip the roast cache and ask GPT-4 again for every recap
+    force_refresh = st.sidebar.checkbox("Force regenerate recaps")
+
+    # Recap the whole league in a single OpenAI request
+    batch = st.sidebar.checkbox("Batch mode (one request per season)")
+
+    # Recaps precomputed by precompute.py are served straight from disk
+    artifact = None if force_refresh else load_season_artifact(league_id)
+    if artifact:
+        user_recaps, generated_at = artifact
+        st.caption(f"Precomputed {generated_at}")
+        display_user_recaps(user_recaps)
+        return
 
     st.write("Checking for player data...")
-    player_data = fetch_and_cache_players()
+    try:
+        player_index = load_player_index()
+    except RuntimeError:
+        player_index = {}
 
-    if player_data:
+    if player_index:
         st.success("Player data loaded successfully.")
         print("Player data loaded successfully.")
 
-        team_mapping = get_team_mapping_with_players(player_data)
-        for week in range(1, 18):
-            get_matchups_with_teams(week, team_mapping)
+        # Warm the GIF pool while the season and recaps are loaded
+        gif_api_key = giphy_api_key()
+        if gif_api_key:
+            prefetch_gif_pools(["nfl celebration"], gif_api_key)
+
+        team_mapping = get_team_mapping_with_players(player_index, league_id)
+        # Concurrent viewers share one season load and one recap run
+        season_table = SeasonTable(single_flight(
+            (league_id, "season", "matchups"), load_season_matchups, league_id=league_id
+        ))
 
         with st.spinner("Generating recaps for all users..."):
-            user_recaps = generate_user_recaps(team_mapping)
+            user_recaps = single_flight(
+                (league_id, "season", "recaps", force_refresh, batch),
+                generate_user_recaps,
+                team_mapping, season_table, player_index,
+                max_in_flight=max_in_flight, force_refresh=force_refresh, batch=batch
+            )
             display_user_recaps(user_recaps)
     else:
         st.error("Failed to load player data. Please try again later.")
@@ -0,0 +1,115 @@
+import os
+import random
+import threading
+import time
+
+import http_client
+from tracing import mark_cache, span
+
+# Overridable so load tests can point it at a local stub (see loadtest.py)
+GIPHY_SEARCH_URL = os.environ.get("GIPHY_SEARCH_URL", "https://api.giphy.com/v1/gifs/search")
+
+# Number of results fetched per query and how long a pool is reused, in seconds
+GIF_POOL_SIZE = 50
+GIF_POOL_TTL = 60 * 60
+
+# Failed searches are remembered briefly so a broken Giphy is not retried per matchup
+GIF_ERROR_TTL = 60
+
+# Searches get a single short attempt, never the shared session's retries
+GIPHY_TIMEOUT = (2, 3)
+
+# Seconds pick_gif waits for a search already in flight before showing a placeholder
+GIF_WAIT_TIMEOUT = 1
+
+NO_API_KEY_URL = "https://via.placeholder.com/300x200.png?text=No+GIF+Available"
+NO_GIFS_URL = "https://via.placeholder.com/300x200.png?text=No+GIFs"
+GIF_ERROR_URL = "https://via.placeholder.com/300x200.png?text=GIF+Error"
+GIF_PENDING_URL = "https://via.placeholder.com/300x200.png?text=GIF+Loading"
+
+# Returned by get_gif_pool when another thread's search did not finish within `wait`
+POOL_PENDING = object()
+
+_pools = {}
+_pool_locks = {}
+_pools_lock = threading.Lock()
+
+
+def _lock_for(query):
+    with _pools_lock:
+        return _pool_locks.setdefault(query, threading.Lock())
+
+
+# Function to get the cached GIF URLs for a query, searching Giphy once per TTL.
+# With `wait` set, gives up after that many seconds if another thread is searching.
+def get_gif_pool(query, api_key, wait=None):
+    entry = _pools.get(query)
+    if entry and entry[0] > time.time():
+        mark_cache(True)
+        return entry[1]
+    mark_cache(False)
+
+    # Only one thread searches per query; the others wait for its result
+    lock = _lock_for(query)
+    if not lock.acquire(timeout=-1 if wait is None else wait):
+        return POOL_PENDING
+    try:
+        entry = _pools.get(query)
+        if entry and entry[0] > time.time():
+            return entry[1]
+        try:
+            response = http_client.get(
+                GIPHY_SEARCH_URL,
+                params={"api_key": api_key, "q": query, "limit": GIF_POOL_SIZE, "offset": 0, "rating": "g", "lang": "en"},
+                timeout=GIPHY_TIMEOUT,
+                retry=False,
+            )
+            response.raise_for_status()
+            gifs = [gif["images"]["original"]["url"] for gif in response.json().get("data", [])]
+            _pools[query] = (time.time() + GIF_POOL_TTL, gifs)
+            return gifs
+        except Exception as e:
+            print(f"Error fetching GIFs for '{query}': {e}")
+            _pools[query] = (time.time() + GIF_ERROR_TTL, None)
+            return None
+    finally:
+        lock.release()
+
+
+# Function to warm the pools for a page's queries in the background
+def prefetch_gif_pools(queries, api_key):
+    for query in set(queries):
+        threading.Thread(target=get_gif_pool, args=(query, api_key), daemon=True).start()
+
+
+# Function to pick a random GIF from a query's pool, avoiding the URLs in `used`
+def pick_gif(query, api_key, used=None):
+    gifs = get_gif_pool(query, api_key, wait=GIF_WAIT_TIMEOUT)
+    if gifs is POOL_PENDING:
+        return GIF_PENDING_URL
+    if gifs is None:
+        return GIF_ERROR_URL
+    if not gifs:
+        return NO_GIFS_URL
+
+    candidates = [gif for gif in gifs if used is None or gif not in used] or gifs
+    gif = random.choice(candidates)
+    if used is not None:
+        used.add(gif)
+    return gif
+
+
+# Function to read the Giphy API key from secrets.toml, if one is configured
+def giphy_api_key():
+    import streamlit as st
+
+    return st.secrets.get("giphy", {}).get("api_key", None)
+
+
+# Function to fetch a random GIF for a page, avoiding the URLs in `used`
+def fetch_random_gif(query="nfl celebration", used=None):
+    api_key = giphy_api_key()
+    if not api_key:
+        return NO_API_KEY_URL
+    with span("giphy.gif", query=query):
+        return pick_gif(query, api_key, used)
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tracing import add_bytes
+
+# (connect, read) timeouts in seconds, per upstream host
+DEFAULT_TIMEOUT = (5, 15)
+HOST_TIMEOUTS = {
+    "api.sleeper.app": (5, 15),
+    "api.giphy.com": (3, 5),
+    "sleepercdn.com": (3, 10),
+}
+
+# Size of the keep-alive connection pool kept per host
+POOL_MAXSIZE = 16
+
+# Retry idempotent requests on rate limits and server errors with exponential backoff,
+# honoring Retry-After when the upstream sends one
+RETRY_POLICY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+_session = None
+# Same pool without retries, for callers that already have a fallback (images, Giphy)
+# and must not stall a page behind several timed-out attempts
+_no_retry_session = None
+_session_lock = threading.Lock()
+
+
+def _new_session(max_retries):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE, max_retries=max_retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Function to get a process-wide pooled session, creating it on first use
+def get_session(retry=True):
+    global _session, _no_retry_session
+    with _session_lock:
+        if retry:
+            if _session is None:
+                _session = _new_session(RETRY_POLICY)
+            return _session
+        if _no_retry_session is None:
+            _no_retry_session = _new_session(0)
+        return _no_retry_session
+
+
+def _timeout_for(url):
+    return HOST_TIMEOUTS.get(urlparse(url).hostname, DEFAULT_TIMEOUT)
+
+
+# Function to issue a GET through the shared session with the host's timeout
+def get(url, params=None, headers=None, timeout=None, retry=True):
+    response = get_session(retry).get(url, params=params, headers=headers, timeout=timeout or _timeout_for(url))
+    add_bytes(len(response.content))
+    return response
+
+
+# Function to GET a JSON document, raising on HTTP errors
+def get_json(url, params=None, timeout=None):
+    response = get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def _validators_path(path):
+    return f"{path}.meta.json"
+
+
+# Function to download a URL into a local file using conditional requests.
+# The ETag/Last-Modified of the stored copy are sent back, so an unchanged
+# upstream answers 304 and nothing is transferred. Returns True when the
+# file was (re)written and False when the stored copy is still current.
+def download_to_file(url, path, timeout=None, retry=True):
+    headers = {}
+    if os.path.exists(path):
+        try:
+            with open(_validators_path(path), "r") as f:
+                validators = json.load(f)
+        except (OSError, ValueError):
+            validators = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    with get_session(retry).get(url, headers=headers, timeout=timeout or _timeout_for(url), stream=True) as response:
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+                add_bytes(len(chunk))
+        os.replace(tmp_path, path)
+
+        with open(_validators_path(path), "w") as f:
+            json.dump({
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }, f)
+    return True
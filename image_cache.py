@@ -0,0 +1,125 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+import http_client
+from memory_lru import MemoryLRU
+from single_flight import single_flight
+
+# Avatars and team logos are downloaded once, shrunk to the size the pages show them
+# at, and served to st.image as bytes, so viewers never pull full-size images from
+# the CDNs. Downloads always happen in the background: until a thumbnail is cached
+# the page shows the remote URL, so a slow or broken CDN never delays rendering.
+
+# Directory holding the downloaded originals and their thumbnails
+IMAGE_CACHE_DIR = "image_cache"
+
+# Longest side of the stored thumbnails, in pixels (pages render avatars at width=100)
+THUMBNAIL_SIZE = 100
+
+# How long a thumbnail is served before the original is revalidated with a conditional request
+IMAGE_REVALIDATE_AFTER = 24 * 60 * 60
+
+# Failed downloads are remembered briefly so a broken CDN is not retried on every rerun
+IMAGE_ERROR_TTL = 5 * 60
+
+# Image hosts get short (connect, read) timeouts and a single attempt; a miss falls back to the remote URL
+IMAGE_TIMEOUT = (2, 5)
+
+# Memory budget for thumbnails kept in process, as {url: (expires_at, image bytes or None)}
+IMAGE_MEMORY_MAX_BYTES = 16 * 1024 * 1024
+
+_thumbnails = MemoryLRU(IMAGE_MEMORY_MAX_BYTES)
+
+
+def _cache_paths(url):
+    base = os.path.join(IMAGE_CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest()[:32])
+    return f"{base}.src", f"{base}.thumb"
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# Function to shrink a downloaded original to a thumbnail and store it next to it;
+# transparent images stay PNG, everything else becomes a much smaller JPEG
+def _make_thumbnail(source_path, thumb_path):
+    # Pillow is only needed when a thumbnail is (re)built; cached ones are served as bytes
+    from PIL import Image
+
+    with Image.open(source_path) as image:
+        transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if transparent:
+            image.save(buffer, "PNG", optimize=True)
+        else:
+            image.save(buffer, "JPEG", quality=85, optimize=True)
+    data = buffer.getvalue()
+
+    tmp_path = f"{thumb_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, thumb_path)
+    return data
+
+
+# Function to (re)download an image if it changed upstream and rebuild its thumbnail
+def _refresh_thumbnail(url):
+    source_path, thumb_path = _cache_paths(url)
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        changed = http_client.download_to_file(url, source_path, timeout=IMAGE_TIMEOUT, retry=False)
+        if changed or not os.path.exists(thumb_path):
+            data = _make_thumbnail(source_path, thumb_path)
+        else:
+            # 304: the stored thumbnail is still current; restart its revalidation clock
+            data = _read(thumb_path)
+            os.utime(thumb_path)
+        _thumbnails.put(url, (time.time() + IMAGE_REVALIDATE_AFTER, data))
+        return data
+    except Exception as e:
+        print(f"Error caching image {url}: {e}")
+        # Keep serving the previous thumbnail, if there is one, until the next attempt
+        entry = _thumbnails.get(url)
+        data = entry[1] if entry else None
+        _thumbnails.put(url, (time.time() + IMAGE_ERROR_TTL, data))
+        return data
+
+
+def _lookup(url):
+    entry = _thumbnails.get(url)
+    if entry is None:
+        _, thumb_path = _cache_paths(url)
+        try:
+            entry = (os.path.getmtime(thumb_path) + IMAGE_REVALIDATE_AFTER, _read(thumb_path))
+        except OSError:
+            return None
+        _thumbnails.put(url, entry)
+    return entry
+
+
+# Function to get what st.image should show for an avatar or logo URL: the cached
+# thumbnail bytes, or the URL itself while no copy is cached. Missing and stale
+# thumbnails are (re)fetched in the background; the current answer is served meanwhile.
+def thumbnail(url):
+    if not url:
+        return url
+    entry = _lookup(url)
+    data = entry[1] if entry else None
+    if entry is None or entry[0] <= time.time():
+        # Hold the current answer while the download runs, so reruns don't start another
+        _thumbnails.put(url, (time.time() + IMAGE_ERROR_TTL, data))
+        # Concurrent sessions showing the same image share one download
+        threading.Thread(target=single_flight, args=(("thumbnail", url), _refresh_thumbnail, url), daemon=True).start()
+    return data if data is not None else url
+
+
+# Function to start downloading a page's uncached images before it renders them
+def prefetch_thumbnails(urls):
+    for url in set(urls):
+        thumbnail(url)
@@ -0,0 +1,238 @@
+import functools
+import os
+
+import streamlit as st
+
+from memory_lru import MemoryLRU
+from models import Team, clear_players, get_player
+from player_cache import PlayerCache, PlayerCacheError
+from player_index import PlayerIndex, build_player_index, index_is_current
+from single_flight import single_flight
+from sleeper_client import SLEEPER_CDN_URL, get_matchups_for_week, get_rosters, get_users_in_league
+from tracing import mark_cache, span
+
+# How long each piece of league metadata is shared across sessions, in seconds
+PLAYER_INDEX_TTL = 24 * 60 * 60
+LEAGUE_USERS_TTL = 6 * 60 * 60
+LEAGUE_ROSTERS_TTL = 30 * 60
+TEAM_MAPPING_TTL = LEAGUE_ROSTERS_TTL
+
+# Matchups are only coalesced briefly, matching the fastest live-mode poll
+LEAGUE_MATCHUPS_TTL = 15
+
+# Memory budget shared by the per-league caches of every league this process serves
+LEAGUE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Path to the player cache file
+PLAYER_CACHE_FILE = "players_cache.json"
+
+# Path to the compact player index built from the cache file
+PLAYER_INDEX_FILE = "players_index.bin"
+
+# Raw player dump on disk, written atomically and refreshed in the background (see player_cache.py)
+_player_cache = PlayerCache(PLAYER_CACHE_FILE)
+
+# Per-league rosters, users, matchups and team mappings, evicted least recently used first
+_league_lru = MemoryLRU(LEAGUE_CACHE_MAX_BYTES)
+
+# st.cache_* functions cleared by the "Refresh league" control, in addition to the LRU.
+# Keyed by name because page scripts redefine their cached functions on every rerun.
+_league_caches = {}
+
+_MISSING = object()
+
+
+# Decorator caching `func(league_id, *args)` in the shared per-league LRU for `ttl` seconds
+# (or for `ttl(result)` seconds when it is a function; None keeps the entry until evicted).
+# Keyword arguments are passed through but not part of the key (like st.cache_data's `_` args),
+# and concurrent misses for the same key share one call.
+def league_cached(ttl):
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(league_id, *args, **kwargs):
+            key = (str(league_id), name) + args
+            value = _league_lru.get(key, _MISSING)
+            hit = value is not _MISSING
+            if not hit:
+                value = single_flight(key, func, league_id, *args, **kwargs)
+                _league_lru.put(key, value, ttl(value) if callable(ttl) else ttl)
+            mark_cache(hit)
+            return value
+        return wrapper
+    return decorator
+
+
+# Function to fetch and cache player data
+def fetch_and_cache_players():
+    with span("players.load"):
+        return _fetch_and_cache_players()
+
+
+def _fetch_and_cache_players():
+    if index_is_current(PLAYER_INDEX_FILE, PLAYER_CACHE_FILE):
+        mark_cache(True)
+        try:
+            return PlayerIndex(PLAYER_INDEX_FILE)
+        except Exception as e:
+            st.warning(f"Player index corrupted. Rebuilding it. Error: {e}")
+
+    mark_cache(False)
+    player_data = None
+    if os.path.exists(PLAYER_CACHE_FILE):
+        try:
+            player_data = _player_cache.read()
+        except PlayerCacheError as e:
+            st.warning(f"Cache file unusable. Re-fetching player data. Error: {e}")
+
+    if player_data is None:
+        # Fetch data from Sleeper API; the stored copy (if any) is unusable, so skip revalidation
+        try:
+            player_data = _player_cache.refresh(revalidate=False)
+        except Exception as e:
+            st.error(f"Error fetching player data: {e}")
+            return {}
+
+    # Project the full dump down to the compact index once, then serve lookups from it
+    build_player_index(player_data, PLAYER_INDEX_FILE)
+    return PlayerIndex(PLAYER_INDEX_FILE)
+
+
+# Function to rebuild the index from a refreshed dump and drop the shared one, so the
+# next page run reopens it. Runs on the refresh thread, never inside a page load.
+def _rebuild_player_index(player_data):
+    build_player_index(player_data, PLAYER_INDEX_FILE)
+    _load_player_index.clear()
+
+
+@st.cache_resource(ttl=PLAYER_INDEX_TTL, show_spinner=False)
+def _load_player_index():
+    player_index = fetch_and_cache_players()
+    if not player_index:
+        # Raising keeps the failed load out of the cache so the next run retries
+        raise RuntimeError("Player data is unavailable")
+    # Shared Player records were read from the previous index
+    clear_players()
+    return player_index
+
+
+# Function to get the read-only player index shared by every page, league and session in
+# this process. Once the dump is older than PLAYER_CACHE_MAX_AGE it is revalidated in the
+# background while viewers keep being served the current index.
+def load_player_index():
+    player_index = _load_player_index()
+    _player_cache.refresh_in_background(on_refresh=_rebuild_player_index, touch=(PLAYER_INDEX_FILE,))
+    return player_index
+
+
+# Function to fetch a league's users, shared by every session for LEAGUE_USERS_TTL
+@league_cached(ttl=LEAGUE_USERS_TTL)
+def load_league_users(league_id):
+    return get_users_in_league(league_id=league_id)
+
+
+# Function to fetch a league's rosters, shared by every session for LEAGUE_ROSTERS_TTL
+@league_cached(ttl=LEAGUE_ROSTERS_TTL)
+def load_league_rosters(league_id):
+    return get_rosters(league_id=league_id)
+
+
+# Function to fetch a league's matchups for a week, shared by every session for LEAGUE_MATCHUPS_TTL
+@league_cached(ttl=LEAGUE_MATCHUPS_TTL)
+def load_league_matchups(league_id, week):
+    return get_matchups_for_week(league_id=league_id, week=week)
+
+
+# Function to get a Sleeper user's avatar URL, or a placeholder without one
+def fetch_avatar(avatar_id):
+    if avatar_id:
+        return f"{SLEEPER_CDN_URL}/avatars/{avatar_id}"
+    return "https://via.placeholder.com/150.png?text=No+Avatar"
+
+
+# Function to build a league's {roster_id: Team} mapping, shared by every page and session
+# until the league cache expires
+@league_cached(ttl=TEAM_MAPPING_TTL)
+def build_team_mapping(league_id, player_index):
+    league_users = load_league_users(league_id)
+    league_rosters = load_league_rosters(league_id)
+
+    user_mapping = {
+        user["user_id"]: {
+            "name": user.get("display_name", f"User {user['user_id']}"),
+            "avatar": fetch_avatar(user.get("avatar")),
+        }
+        for user in league_users
+    }
+
+    team_mapping = {}
+    for roster in league_rosters:
+        players = {
+            player_id: get_player(player_index, player_id)
+            for player_id in roster.get("players") or []
+        }
+        owner = user_mapping.get(roster["owner_id"], {})
+        team_mapping[roster["roster_id"]] = Team(
+            roster["roster_id"],
+            roster.get("metadata", {}).get("team_name", owner.get("name", f"Team {roster['roster_id']}")),
+            avatar=owner.get("avatar"),
+            owner=owner.get("name"),
+            players=players,
+        )
+    return team_mapping
+
+
+# Function to fetch a league's team mapping with player details, or {} after showing the error
+def get_team_mapping_with_players(player_index, league_id):
+    try:
+        with span("sleeper.team_mapping", league=league_id):
+            return build_team_mapping(league_id, player_index=player_index)
+    except Exception as e:
+        st.error(f"Error fetching league rosters or users: {e}")
+        return {}
+
+
+# Function to register an st.cache_* function (e.g. ESPN's League handle) as league metadata
+def register_league_cache(cached_func):
+    _league_caches[(cached_func.__module__, cached_func.__qualname__)] = cached_func
+    return cached_func
+
+
+# Function to drop cached league metadata so the next run refetches it, for one league or
+# (when `league_id` is None) all of them. st.cache_* functions registered above cannot be
+# cleared per league, so they are always cleared in full.
+def refresh_league(league_id=None):
+    if league_id is None:
+        _league_lru.clear()
+    else:
+        _league_lru.discard(lambda key: key[0] == str(league_id))
+    for cached_func in _league_caches.values():
+        cached_func.clear()
+
+
+# Function to render the sidebar "Refresh league" control
+def refresh_league_button(league_id=None):
+    if st.sidebar.button("Refresh league", help="Refetch league users and rosters now instead of waiting for the cache to expire"):
+        refresh_league(league_id)
+
+
+# Function to check a league ID before it reaches URLs and cache paths (Sleeper and ESPN IDs are numeric)
+def is_valid_league_id(league_id):
+    league_id = str(league_id)
+    return league_id.isascii() and league_id.isdigit()
+
+
+# Function to pick this session's league: the ?league= query parameter or the sidebar
+# input, falling back to `default_league_id`. A valid choice is written back to the URL
+# so each league's page can be bookmarked and shared; an invalid one shows an error
+# and returns None.
+def select_league(default_league_id):
+    league_id = st.sidebar.text_input(
+        "League ID", value=st.query_params.get("league", str(default_league_id))
+    ).strip() or str(default_league_id)
+    if not is_valid_league_id(league_id):
+        st.error(f"League IDs are numeric, got {league_id!r}.")
+        return None
+    st.query_params["league"] = league_id
+    return league_id
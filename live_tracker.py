@@ -0,0 +1,78 @@
+# Score tracking for live game-day mode: snapshot each matchup's scores on every
+# poll, work out which matchups moved, and decide which ones deserve a new roast.
+import threading
+
+# Seconds between Sleeper polls
+LIVE_POLL_INTERVAL = 60
+
+# Change in a matchup's margin, in points, that triggers a new roast
+REROAST_MARGIN_THRESHOLD = 10.0
+
+# How long a week's live roasts are kept for the viewers of that week, in seconds
+LIVE_ROASTS_TTL = 12 * 60 * 60
+
+
+# Function to snapshot {matchup_id: (points, ...)} from grouped matchups
+def snapshot_scores(matchups):
+    return {
+        matchup_id: tuple(team.points or 0 for team in teams)
+        for matchup_id, teams in matchups.items()
+    }
+
+
+# Function to get each matchup's per-team score change since the previous snapshot
+def score_deltas(previous, current):
+    deltas = {}
+    for matchup_id, scores in current.items():
+        before = previous.get(matchup_id)
+        if before is None or len(before) != len(scores):
+            continue
+        changes = tuple(round(now - then, 2) for now, then in zip(scores, before))
+        if any(changes):
+            deltas[matchup_id] = changes
+    return deltas
+
+
+def _margin(scores):
+    return scores[0] - scores[1] if len(scores) == 2 else scores[0]
+
+
+# Function to decide whether a matchup moved enough since its last roast to roast it again:
+# the lead changed hands, or the margin swung by at least `threshold` points
+def needs_reroast(roasted_scores, current_scores, threshold=REROAST_MARGIN_THRESHOLD):
+    if roasted_scores is None or len(roasted_scores) != len(current_scores):
+        return True
+    before, now = _margin(roasted_scores), _margin(current_scores)
+    if len(current_scores) == 2 and (before > 0) != (now > 0):
+        return True
+    return abs(now - before) >= threshold
+
+
+# Roasts for one live week, shared by every viewer in this process so each swing is
+# roasted once rather than once per viewer: each matchup's latest roast and the scores
+# it was written for
+class LiveRoasts:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roasts = {}
+        self._roasted_scores = {}
+
+    # Function to pick the matchups whose scores moved enough since their last roast
+    def swung(self, matchups, scores, threshold=REROAST_MARGIN_THRESHOLD):
+        with self._lock:
+            return {
+                matchup_id: teams for matchup_id, teams in matchups.items()
+                if needs_reroast(self._roasted_scores.get(matchup_id), scores[matchup_id], threshold)
+            }
+
+    # Function to store new roasts; failed ones are shown but retried on the next poll
+    def record(self, roasts, scores):
+        with self._lock:
+            for roast in roasts:
+                self._roasts[roast['matchup_id']] = roast['roast']
+                if not roast.get('error'):
+                    self._roasted_scores[roast['matchup_id']] = scores[roast['matchup_id']]
+
+    def roast(self, matchup_id):
+        with self._lock:
+            return self._roasts.get(matchup_id, "")
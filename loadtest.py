@@ -0,0 +1,407 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from PIL import Image
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+# Concurrent-session load generator. Starts local stub servers for Sleeper, OpenAI,
+# Giphy and the avatar CDN, runs app.py under a real `streamlit run` pointed at them,
+# then has N simulated viewers open websocket sessions that either pick a random week
+# on the weekly roaster or load the season-recap page. Reports page-completion
+# latency percentiles, throughput and the server's RSS growth.
+#
+#     python loadtest.py --sessions 20 --duration 60 --openai-latency 2.0
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+LEAGUE_ID = "1000000000000000001"
+
+# Production URL prefixes and the stub paths serving them (see start_stub_server)
+STUB_ROUTES = (
+    ("https://api.sleeper.app/v1", "/sleeper/v1"),
+    ("https://sleepercdn.com", "/cdn"),
+    ("https://api.giphy.com/v1/gifs/search", "/giphy/v1/gifs/search"),
+)
+
+# Label of the week selector on the weekly roaster (sleep.py)
+WEEK_SELECT_LABEL = "Select Week:"
+
+# Seconds to wait for the Streamlit server to come up, and for one page to finish
+SERVER_START_TIMEOUT = 60
+PAGE_TIMEOUT = 300
+
+
+# Function to build a synthetic league: player dump, users, rosters and per-week matchups
+def build_league(teams, roster_size, seed=0):
+    rng = random.Random(seed)
+    positions = ["QB", "RB", "WR", "TE", "K", "DEF"]
+    players = {
+        str(player_id): {
+            "full_name": f"Player {player_id}",
+            "first_name": "Player",
+            "last_name": str(player_id),
+            "position": rng.choice(positions),
+            "team": rng.choice(["KC", "BUF", "DAL", "SF", "PHI", "DET"]),
+        }
+        for player_id in range(1, teams * roster_size * 4 + 1)
+    }
+    player_ids = list(players)
+    rng.shuffle(player_ids)
+    users = [{"user_id": f"u{team}", "display_name": f"Owner {team}", "avatar": f"a{team}"} for team in range(1, teams + 1)]
+    rosters = [
+        {
+            "roster_id": team,
+            "owner_id": f"u{team}",
+            "players": player_ids[(team - 1) * roster_size:team * roster_size],
+            "metadata": {"team_name": f"Team {team}"},
+        }
+        for team in range(1, teams + 1)
+    ]
+
+    def matchups(week):
+        week_rng = random.Random(f"{seed}:{week}")
+        entries = []
+        for roster in rosters:
+            starters = roster["players"][:9]
+            starters_points = [round(week_rng.uniform(0, 30), 2) for _ in starters]
+            entries.append({
+                "roster_id": roster["roster_id"],
+                "matchup_id": (roster["roster_id"] + 1) // 2,
+                "points": round(sum(starters_points), 2),
+                "starters": starters,
+                "starters_points": starters_points,
+            })
+        return entries
+
+    return {"players": players, "users": users, "rosters": rosters, "matchups": matchups}
+
+
+def _png(size=300):
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 80, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# Function to start the stub Sleeper/OpenAI/Giphy/CDN server, returning (server, base URL)
+def start_stub_server(league, latency):
+    avatar = _png()
+    counts = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body, content_type="application/json"):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", '"stub"')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _count(self, service):
+            with lock:
+                counts[service] = counts.get(service, 0) + 1
+            time.sleep(latency.get(service, 0))
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path.startswith("/sleeper/"):
+                self._count("sleeper")
+                week = re.search(r"/matchups/(\d+)$", path)
+                if path.endswith("/players/nfl"):
+                    return self._send(league["players"])
+                if path.endswith("/state/nfl"):
+                    return self._send({"season_type": "post", "week": 18})
+                if path.endswith("/users"):
+                    return self._send(league["users"])
+                if path.endswith("/rosters"):
+                    return self._send(league["rosters"])
+                if week:
+                    return self._send(league["matchups"](int(week.group(1))))
+            elif path.startswith("/giphy/"):
+                self._count("giphy")
+                return self._send({"data": [
+                    {"images": {"original": {"url": f"https://media.giphy.com/media/stub{i}/giphy.gif"}}} for i in range(50)
+                ]})
+            elif path.startswith("/cdn/"):
+                self._count("cdn")
+                return self._send(avatar, "image/png")
+            self.send_error(404)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.startswith("/openai/"):
+                return self.send_error(404)
+            self._count("openai")
+            text = "Stub roast: " + " ".join(["what a week"] * 20)
+            if not request.get("stream"):
+                return self._send({
+                    "choices": [{"message": {"role": "assistant", "content": text}}],
+                    "usage": {"total_tokens": 300},
+                })
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in text.split(" "):
+                chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.counts = counts
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# A requests session sending the production Sleeper, Giphy and CDN URLs to the stub, so
+# fixtures recorded through it are keyed like the real services (benchmark.py --synthetic)
+class StubSession:
+    def __init__(self, stub_url):
+        self.stub_url = stub_url
+        self._session = requests.Session()
+
+    def get(self, url, **kwargs):
+        for prefix, path in STUB_ROUTES:
+            if url.startswith(prefix):
+                url = self.stub_url + path + url[len(prefix):]
+                break
+        return self._session.get(url, **kwargs)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Function to run app.py under `streamlit run` in a scratch directory, pointed at the stubs
+def start_app(stub_url, workdir):
+    os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write('[openai]\napi_key = "stub"\n\n[giphy]\napi_key = "stub"\n')
+
+    port = _free_port()
+    env = dict(
+        os.environ,
+        SLEEPER_API_URL=f"{stub_url}/sleeper/v1",
+        SLEEPER_CDN_URL=f"{stub_url}/cdn",
+        GIPHY_SEARCH_URL=f"{stub_url}/giphy/v1/gifs/search",
+        OPENAI_API_BASE=f"{stub_url}/openai/v1",
+        PYTHONPATH=REPO_DIR,
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(REPO_DIR, "app.py"),
+         "--server.headless", "true", "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return process, port
+        except OSError:
+            time.sleep(0.25)
+    process.kill()
+    raise RuntimeError("Streamlit server did not start")
+
+
+# Function to read a process's current and peak resident memory, in megabytes
+def process_rss_mb(pid):
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                name, kilobytes = line.split()[:2]
+                values[name.rstrip(":")] = int(kilobytes) / 1024
+    return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+
+
+# One simulated viewer: a websocket session that reruns the script like a browser would
+class Session:
+    def __init__(self, port, query_string):
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.query_string = query_string
+        self.connection = None
+        self.widgets = {}
+
+    async def connect(self):
+        self.connection = await websocket_connect(self.url)
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+
+    # Function to rerun the script with the given widget states and wait for it to
+    # finish, returning whether the run finished without a rendered exception
+    async def rerun(self, widget_states=()):
+        message = BackMsg()
+        message.rerun_script.query_string = self.query_string
+        for widget_id, value in widget_states:
+            state = message.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            state.int_value = value
+        await self.connection.write_message(message.SerializeToString(), binary=True)
+
+        ok = True
+        while True:
+            raw = await asyncio.wait_for(self.connection.read_message(), PAGE_TIMEOUT)
+            if raw is None:
+                raise ConnectionError("websocket closed")
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                if element.WhichOneof("type") == "selectbox":
+                    self.widgets[element.selectbox.label] = (element.selectbox.id, list(element.selectbox.options))
+                elif element.WhichOneof("type") == "exception":
+                    ok = False
+            elif kind == "script_finished":
+                if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                return ok and forward.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY
+
+
+# Function to run one viewer's page load: a random week on the roaster, or the season recaps.
+# Returns (page, seconds, ok).
+async def view_page(port, season_share, rng):
+    if rng.random() < season_share:
+        session = Session(port, f"provider=sleeper&page=season&league={LEAGUE_ID}")
+        await session.connect()
+        try:
+            start = time.perf_counter()
+            ok = await session.rerun()
+            return "season", time.perf_counter() - start, ok
+        finally:
+            session.close()
+
+    session = Session(port, f"provider=sleeper&page=weekly&league={LEAGUE_ID}")
+    await session.connect()
+    try:
+        await session.rerun()
+        widget_id, options = session.widgets[WEEK_SELECT_LABEL]
+        weeks = [index for index, option in enumerate(options) if option.startswith("Week ")]
+        start = time.perf_counter()
+        ok = await session.rerun([(widget_id, rng.choice(weeks))])
+        return "week", time.perf_counter() - start, ok
+    finally:
+        session.close()
+
+
+async def _run_load(port, sessions, duration, season_share, seed):
+    results = []
+    deadline = time.perf_counter() + duration
+
+    async def viewer(index):
+        rng = random.Random(f"{seed}:{index}")
+        while time.perf_counter() < deadline:
+            try:
+                results.append(await view_page(port, season_share, rng))
+            except Exception as e:
+                results.append(("error", 0.0, False))
+                print(f"Session {index} failed: {e}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(viewer(index) for index in range(sessions)))
+    return results, time.perf_counter() - start
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+# Function to summarize the page loads: latency percentiles, throughput and failures per page
+def summarize(results, elapsed):
+    summary = {}
+    for page in sorted({page for page, _, _ in results}):
+        latencies = [seconds for name, seconds, ok in results if name == page and ok]
+        summary[page] = {
+            "completed": len(latencies),
+            "failed": sum(1 for name, _, ok in results if name == page and not ok),
+            "p50_s": round(_percentile(latencies, 0.50), 3),
+            "p95_s": round(_percentile(latencies, 0.95), 3),
+            "p99_s": round(_percentile(latencies, 0.99), 3),
+        }
+    completed = sum(1 for _, _, ok in results if ok)
+    summary["throughput_pages_per_s"] = round(completed / elapsed, 2) if elapsed else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit pages with concurrent simulated viewers.")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated viewers")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep generating load")
+    parser.add_argument("--season-share", type=float, default=0.2, help="fraction of page loads that open the season recaps")
+    parser.add_argument("--teams", type=int, default=12, help="teams in the synthetic league")
+    parser.add_argument("--roster-size", type=int, default=16, help="players per roster")
+    parser.add_argument("--sleeper-latency", type=float, default=0.08, help="stub Sleeper response time, seconds")
+    parser.add_argument("--openai-latency", type=float, default=1.0, help="stub OpenAI response time, seconds")
+    parser.add_argument("--giphy-latency", type=float, default=0.1, help="stub Giphy response time, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    league = build_league(args.teams, args.roster_size, args.seed)
+    latency = {"sleeper": args.sleeper_latency, "openai": args.openai_latency, "giphy": args.giphy_latency, "cdn": 0.02}
+    stub, stub_url = start_stub_server(league, latency)
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        process, port = start_app(stub_url, workdir)
+        try:
+            rss_start, _ = process_rss_mb(process.pid)
+            results, elapsed = asyncio.run(_run_load(port, args.sessions, args.duration, args.season_share, args.seed))
+            rss_end, rss_peak = process_rss_mb(process.pid)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            stub.shutdown()
+
+    report = summarize(results, elapsed)
+    report.update({
+        "sessions": args.sessions,
+        "elapsed_s": round(elapsed, 1),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_end, 1),
+        "rss_peak_mb": round(rss_peak, 1),
+        "rss_growth_mb": round(rss_end - rss_start, 1),
+        "upstream_calls": dict(stub.counts),
+    })
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for page in ("week", "season", "error"):
+            if page in report:
+                stats = report[page]
+                print(
+                    f"{page:>6}: {stats['completed']} ok, {stats['failed']} failed, "
+                    f"p50 {stats['p50_s']}s, p95 {stats['p95_s']}s, p99 {stats['p99_s']}s"
+                )
+        print(f"throughput: {report['throughput_pages_per_s']} pages/s over {report['elapsed_s']}s with {args.sessions} sessions")
+        print(f"server RSS: {report['rss_start_mb']} -> {report['rss_end_mb']} MB (peak {report['rss_peak_mb']} MB, growth {report['rss_growth_mb']} MB)")
+        print(f"upstream calls: {report['upstream_calls']}")
+    return 1 if any(not ok for _, _, ok in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
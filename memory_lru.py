@@ -0,0 +1,92 @@
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+
+# Function to estimate how many bytes `value` keeps alive, following containers
+# and object attributes; objects shared with other entries are counted in each
+def approximate_size(value):
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        # Classes, modules and functions belong to the process, not to the cached value
+        if isinstance(obj, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+            continue
+        total += sys.getsizeof(obj, 64)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return total
+
+
+# Least-recently-used cache bounded by the approximate memory its values hold
+# rather than by entry count, with an optional per-entry TTL. Thread-safe.
+class MemoryLRU:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, value), least recently used first
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    # Function to get a live entry, marking it most recently used
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] is not None and entry[0] <= time.time():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    # Function to store an entry, evicting the least recently used ones to stay within budget
+    def put(self, key, value, ttl=None):
+        size = approximate_size(value)
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # A value larger than the whole budget is returned to the caller but never kept
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (expires_at, size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    # Function to drop every entry whose key matches `predicate`
+    def discard(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
@@ -0,0 +1,109 @@
+import sys
+import threading
+
+from player_index import INDEX_FIELDS
+
+# Compact in-memory records for the data the pages keep per league and session.
+# Every class uses __slots__ and interns its repeated strings (names, positions,
+# NFL teams, player IDs), and rosters point at one shared Player per player ID
+# instead of each carrying its own copy of the player's details.
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Player:
+    __slots__ = ("player_id",) + INDEX_FIELDS
+
+    def __init__(self, player_id, full_name=None, first_name=None, last_name=None, position=None, team=None):
+        self.player_id = _intern(player_id)
+        self.full_name = full_name
+        self.first_name = _intern(first_name)
+        self.last_name = _intern(last_name)
+        self.position = _intern(position)
+        self.team = _intern(team)
+
+    # Display name: the full name, else first and last name, else the player ID
+    @property
+    def name(self):
+        return self.full_name or " ".join(
+            part for part in (self.first_name, self.last_name) if part
+        ) or self.player_id
+
+
+# One team in a league, as of its current roster
+class Team:
+    __slots__ = ("roster_id", "team_name", "avatar", "owner", "players")
+
+    def __init__(self, roster_id, team_name, avatar=None, owner=None, players=None):
+        self.roster_id = roster_id
+        self.team_name = _intern(team_name)
+        self.avatar = _intern(avatar)
+        self.owner = _intern(owner)
+        # {player_id: Player}, sharing the process-wide Player records
+        self.players = players or {}
+
+
+# One team's side of a week's matchup
+class MatchupTeam:
+    __slots__ = ("roster_id", "team_name", "avatar", "points", "starters", "starters_points", "players_points")
+
+    def __init__(self, roster_id, team_name, avatar=None, points=0, starters=(), starters_points=(), players_points=None):
+        self.roster_id = roster_id
+        self.team_name = _intern(team_name)
+        self.avatar = _intern(avatar)
+        self.points = points
+        self.starters = tuple(_intern(player_id) for player_id in starters)
+        self.starters_points = tuple(starters_points)
+        self.players_points = {_intern(player_id): points for player_id, points in (players_points or {}).items()}
+
+    # Function to turn the record into plain JSON-serializable data
+    def to_dict(self):
+        return {
+            "roster_id": self.roster_id,
+            "team_name": self.team_name,
+            "avatar": self.avatar,
+            "points": self.points,
+            "starters": list(self.starters),
+            "starters_points": list(self.starters_points),
+            "players_points": dict(self.players_points),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+
+
+# A scoreboard entry for pages whose matchups are not keyed by ID (ESPN)
+class Matchup:
+    __slots__ = ("matchup_id", "teams", "is_playoff")
+
+    def __init__(self, matchup_id, teams, is_playoff=False):
+        self.matchup_id = matchup_id
+        self.teams = tuple(teams)
+        self.is_playoff = is_playoff
+
+
+# Shared Player records, one per player ID for the whole process
+_players = {}
+_players_lock = threading.Lock()
+
+
+# Function to get the shared Player record for a player ID, reading it from the
+# player index the first time it is asked for
+def get_player(player_index, player_id):
+    player = _players.get(player_id)
+    if player is None:
+        details = player_index.get(player_id) or {}
+        with _players_lock:
+            player = _players.setdefault(
+                player_id, Player(player_id, **{field: details.get(field) for field in INDEX_FIELDS})
+            )
+    return player
+
+
+# Function to drop the shared Player records, e.g. after the player index is rebuilt
+def clear_players():
+    with _players_lock:
+        _players.clear()
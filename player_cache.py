@@ -0,0 +1,197 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import sleeper_client
+from tracing import add_bytes, mark_cache, span
+
+# On-disk copy of Sleeper's full /players/nfl dump.
+#
+# Layout: one header line, `SLPRPLAYERS {json}\n`, carrying the format version, when
+# the dump was fetched, its size and the upstream ETag/Last-Modified, followed by the
+# dump exactly as Sleeper sent it. Writes go to a private temp file that is renamed
+# over the cache, so readers and other writers only ever see a complete file. The
+# file's mtime is when it was last confirmed current; once it is older than max_age
+# callers keep serving it while refresh_in_background() revalidates it.
+PLAYER_CACHE_MAGIC = b"SLPRPLAYERS "
+PLAYER_CACHE_VERSION = 1
+
+# How long the dump is served before it is revalidated (SLEEPER_PLAYERS_MAX_AGE, seconds)
+PLAYER_CACHE_MAX_AGE = int(os.environ.get("SLEEPER_PLAYERS_MAX_AGE", 12 * 60 * 60))
+
+# Seconds to wait after a failed background refresh before trying again
+PLAYER_REFRESH_RETRY = 5 * 60
+
+# Longest header line accepted, so a foreign file is never read whole to find one
+_MAX_HEADER_BYTES = 4096
+
+
+class PlayerCacheError(ValueError):
+    pass
+
+
+# Function to pick the fastest JSON decoder installed for the multi-megabyte player dump:
+# orjson, then msgspec, then the standard library. Returns (name, decode).
+def _player_dump_decoder():
+    try:
+        import orjson
+        return "orjson", orjson.loads
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        return "msgspec", msgspec.json.decode
+    except ImportError:
+        return "json", json.loads
+
+
+PLAYER_DUMP_PARSER, _decode_player_dump = _player_dump_decoder()
+
+
+class PlayerCache:
+    def __init__(self, path, max_age=PLAYER_CACHE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._last_failure = 0
+
+    # Function to read the header line, leaving `f` at the start of the dump
+    def _read_header(self, f):
+        line = f.readline(_MAX_HEADER_BYTES)
+        if not line.startswith(PLAYER_CACHE_MAGIC) or not line.endswith(b"\n"):
+            raise PlayerCacheError(f"{self.path} has no player cache header")
+        try:
+            header = json.loads(line[len(PLAYER_CACHE_MAGIC):])
+        except ValueError as e:
+            raise PlayerCacheError(f"{self.path} has a corrupt header: {e}")
+        if header.get("version") != PLAYER_CACHE_VERSION:
+            raise PlayerCacheError(f"{self.path} is cache version {header.get('version')}, expected {PLAYER_CACHE_VERSION}")
+        return header
+
+    # Function to read the header, or None when there is no usable cache file
+    def header(self):
+        try:
+            with open(self.path, "rb") as f:
+                return self._read_header(f)
+        except (OSError, PlayerCacheError):
+            return None
+
+    # Function to read and decode the cached dump, raising PlayerCacheError when the
+    # file is missing, from another version, truncated or not valid JSON
+    def read(self):
+        with span("players.decode", parser=PLAYER_DUMP_PARSER):
+            try:
+                with open(self.path, "rb") as f:
+                    header = self._read_header(f)
+                    body = f.read()
+            except OSError as e:
+                raise PlayerCacheError(f"Cannot read {self.path}: {e}")
+            if len(body) != header.get("bytes"):
+                raise PlayerCacheError(f"{self.path} is truncated ({len(body)} of {header.get('bytes')} bytes)")
+            try:
+                players = _decode_player_dump(body)
+            except Exception as e:
+                raise PlayerCacheError(f"{self.path} holds invalid JSON: {e}")
+            if not isinstance(players, dict):
+                raise PlayerCacheError(f"{self.path} does not hold a player mapping")
+            return players
+
+    # Seconds since the cached dump was last fetched or confirmed current, or None without one
+    def age(self):
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def is_stale(self):
+        age = self.age()
+        return age is None or age > self.max_age
+
+    # Function to download the dump into the cache, sending the stored copy's validators
+    # so an unchanged dump answers 304. Returns the new players, or None when the stored
+    # copy is still current. `touch` lists files (e.g. the index built from the dump)
+    # whose mtime follows the cache's on a 304; revalidate=False always fetches a full body.
+    def refresh(self, touch=(), revalidate=True):
+        with span("players.download"):
+            stored = self.header() if revalidate else None
+            headers = {}
+            if stored and stored.get("etag"):
+                headers["If-None-Match"] = stored["etag"]
+            if stored and stored.get("last_modified"):
+                headers["If-Modified-Since"] = stored["last_modified"]
+
+            with sleeper_client.stream_players(headers=headers) as response:
+                if response.status_code == 304 and stored:
+                    mark_cache(True)
+                    # Restart the revalidation clock; files derived from the dump first,
+                    # so they never look older than it
+                    now = time.time()
+                    for path in tuple(touch) + (self.path,):
+                        if os.path.exists(path):
+                            os.utime(path, (now, now))
+                    return None
+                mark_cache(False)
+                response.raise_for_status()
+                body = b"".join(response.iter_content(chunk_size=1024 * 1024))
+                add_bytes(len(body))
+                header = {
+                    "version": PLAYER_CACHE_VERSION,
+                    "fetched_at": round(time.time(), 3),
+                    "bytes": len(body),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+
+        # Validate before replacing, so a bad response never overwrites a good copy
+        players = _decode_player_dump(body)
+        if not isinstance(players, dict):
+            raise PlayerCacheError("Sleeper returned something other than a player mapping")
+        self._write(header, body)
+        return players
+
+    def _write(self, header, body):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(PLAYER_CACHE_MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # Function to revalidate the dump on a background thread once it is older than
+    # max_age, calling on_refresh(players) after a new dump was stored. At most one
+    # refresh runs at a time, and a failed one is not retried for PLAYER_REFRESH_RETRY.
+    # Returns True when a refresh was started.
+    def refresh_in_background(self, on_refresh=None, touch=()):
+        if not self.is_stale():
+            return False
+        with self._lock:
+            if self._refreshing or time.time() - self._last_failure < PLAYER_REFRESH_RETRY:
+                return False
+            self._refreshing = True
+
+        def run():
+            try:
+                players = self.refresh(touch=touch)
+                if players is not None and on_refresh is not None:
+                    on_refresh(players)
+            except Exception as e:
+                print(f"Background player refresh failed: {e}")
+                with self._lock:
+                    self._last_failure = time.time()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="player-cache-refresh", daemon=True).start()
+        return True
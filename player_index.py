@@ -0,0 +1,109 @@
+import mmap
+import os
+import struct
+import threading
+
+# Compact on-disk player index.
+#
+# Layout: a fixed header, an offset table of (count + 1) little-endian uint32
+# offsets, then one record per player sorted by player ID. Each record is the
+# UTF-8 encoded fields below joined by a unit separator, so a lookup only has to
+# binary search the offset table and decode the handful of records it needs.
+INDEX_MAGIC = b"SLPRIDX\x00"
+INDEX_VERSION = 1
+INDEX_FIELDS = ("full_name", "first_name", "last_name", "position", "team")
+
+_HEADER = struct.Struct("<8sII")
+_OFFSET = struct.Struct("<I")
+_SEPARATOR = b"\x1f"
+
+
+# Function to project the raw Sleeper player dump down to the fields we use
+def _encode_record(player_id, player):
+    values = [str(player_id)]
+    for field in INDEX_FIELDS:
+        value = player.get(field) if isinstance(player, dict) else None
+        values.append("" if value is None else str(value).replace("\x1f", " "))
+    return _SEPARATOR.join(value.encode("utf-8") for value in values)
+
+
+# Function to build the index file from the full /players/nfl payload
+def build_player_index(player_data, index_path):
+    records = sorted(
+        (str(player_id).encode("utf-8"), _encode_record(player_id, player))
+        for player_id, player in player_data.items()
+    )
+
+    offsets = [0]
+    for _, record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    # Private temp name, so concurrent builders (threads or processes) never share one
+    tmp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(records)))
+        f.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+        for _, record in records:
+            f.write(record)
+    os.replace(tmp_path, index_path)
+
+
+# Function to check whether the index needs rebuilding from the JSON dump
+def index_is_current(index_path, json_path):
+    if not os.path.exists(index_path):
+        return False
+    if not os.path.exists(json_path):
+        return True
+    return os.path.getmtime(index_path) >= os.path.getmtime(json_path)
+
+
+class PlayerIndex:
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported player index format in {index_path}")
+
+        self._count = count
+        self._table_start = _HEADER.size
+        self._data_start = self._table_start + (count + 1) * _OFFSET.size
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, player_id):
+        return self._find(player_id) is not None
+
+    def _record(self, position):
+        start, end = struct.unpack_from("<II", self._mm, self._table_start + position * _OFFSET.size)
+        return self._mm[self._data_start + start:self._data_start + end]
+
+    def _find(self, player_id):
+        key = str(player_id).encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            record = self._record(mid)
+            record_key = record.split(_SEPARATOR, 1)[0]
+            if record_key == key:
+                return record
+            if record_key < key:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    # Function to resolve a single player ID into a slim details dict
+    def get(self, player_id, default=None):
+        record = self._find(player_id)
+        if record is None:
+            return default
+        values = record.decode("utf-8").split("\x1f")[1:]
+        return {field: value for field, value in zip(INDEX_FIELDS, values) if value}
+
+    def close(self):
+        self._mm.close()
@@ -0,0 +1,102 @@
+import argparse
+import sys
+
+import final_2025
+import sleep
+from artifacts import write_season_artifact, write_week_artifact
+from league_cache import fetch_and_cache_players, get_team_mapping_with_players, is_valid_league_id
+from roast_engine import configure_openai
+from season_stats import SeasonTable
+
+# Headless batch entry point that runs the roast and recap pipelines outside
+# Streamlit and writes their output as static artifacts the pages load directly.
+# Meant to run from cron after the week's games end, e.g.:
+#
+#     0 4 * * 2  cd /app && python precompute.py --season
+#
+# With no --week the most recently completed NFL week is rendered.
+
+
+# Function to render one week's roasts to an artifact
+def precompute_week(week, player_index, force_refresh=False, batch=False, league_id=sleep.LEAGUE_ID):
+    team_mapping = get_team_mapping_with_players(player_index, league_id)
+    if not team_mapping:
+        raise RuntimeError("Could not load league rosters or users")
+    matchups = sleep.get_matchups_with_teams(week, team_mapping, league_id)
+    if not matchups:
+        raise RuntimeError(f"No matchups found for week {week}")
+
+    is_championship = week >= 16
+    roasts = sleep.generate_roasts_with_players(
+        matchups, team_mapping, is_championship=is_championship,
+        max_in_flight=configure_openai(), force_refresh=force_refresh, batch=batch
+    )
+    # Fallback error text must never be served as a static page
+    failed = [roast['matchup_id'] for roast in roasts if roast.get('error')]
+    if failed:
+        raise RuntimeError(f"Roasts failed for matchups {failed}, artifact not written")
+    return write_week_artifact(league_id, week, matchups, roasts, is_championship=is_championship)
+
+
+# Function to render the season recaps to an artifact
+def precompute_season(player_index, force_refresh=False, batch=False, league_id=final_2025.LEAGUE_ID):
+    team_mapping = get_team_mapping_with_players(player_index, league_id)
+    if not team_mapping:
+        raise RuntimeError("Could not load league rosters or users")
+    season_table = SeasonTable(final_2025.load_season_matchups(league_id=league_id))
+    recaps = final_2025.generate_user_recaps(
+        team_mapping, season_table, player_index,
+        max_in_flight=configure_openai(), force_refresh=force_refresh, batch=batch
+    )
+    failed = [recap['owner'] for recap in recaps if recap.get('error')]
+    if failed:
+        raise RuntimeError(f"Recaps failed for {', '.join(map(str, failed))}, artifact not written")
+    return write_season_artifact(league_id, recaps)
+
+
+def _league_id(value):
+    if not is_valid_league_id(value):
+        raise argparse.ArgumentTypeError(f"league IDs are numeric, got {value!r}")
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute roast and recap pages as static artifacts.")
+    parser.add_argument("--league", type=_league_id, action="append", help="Sleeper league to render (repeatable); defaults to sleep.LEAGUE_ID")
+    parser.add_argument("--week", type=int, action="append", help="week to render (repeatable); defaults to the last completed week")
+    parser.add_argument("--season", action="store_true", help="also render the season recaps")
+    parser.add_argument("--force", action="store_true", help="ignore the roast cache and regenerate")
+    parser.add_argument("--batch", action="store_true", help="use one OpenAI request per week or season")
+    args = parser.parse_args(argv)
+
+    player_index = fetch_and_cache_players()
+    if not player_index:
+        print("Failed to load player data.", file=sys.stderr)
+        return 1
+
+    weeks = args.week
+    if weeks is None:
+        last_final_week = final_2025.get_last_final_week(final_2025.fetch_nfl_state())
+        weeks = [last_final_week] if last_final_week >= 1 else []
+
+    failed = False
+    for league_id in args.league or [sleep.LEAGUE_ID]:
+        for week in weeks:
+            try:
+                print(f"Wrote {precompute_week(week, player_index, args.force, args.batch, league_id)}")
+            except Exception as e:
+                print(f"League {league_id} week {week} failed: {e}", file=sys.stderr)
+                failed = True
+
+        if args.season:
+            try:
+                print(f"Wrote {precompute_season(player_index, args.force, args.batch, league_id)}")
+            except Exception as e:
+                print(f"League {league_id} season recap failed: {e}", file=sys.stderr)
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# Token budget for a single matchup prompt
+PROMPT_TOKEN_BUDGET = 350
+
+# Rough characters-per-token ratio for English text when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+# tiktoken encoding, loaded on the first estimate; False when tiktoken is not installed
+_encoding = None
+
+
+# Function to estimate the number of tokens a piece of text will cost
+def estimate_tokens(text):
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:  # optional dependency; fall back to a character-based estimate
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+# Function to turn a MatchupTeam into its starting lineup, as (label, points) pairs
+# sorted from highest to lowest scorer; `players` maps player IDs to Player records
+def starting_lineup(team, players):
+    starters_points = team.starters_points
+    lineup = []
+    for slot, player_id in enumerate(team.starters):
+        # Empty lineup slots come through as "0"
+        if not player_id or player_id == "0":
+            continue
+        points = starters_points[slot] if slot < len(starters_points) else team.players_points.get(player_id, 0)
+        player = players.get(player_id)
+        name = player.name if player else player_id
+        position = player.position if player else None
+        label = f"{name} ({position}, {points} pts)" if position else f"{name} ({points} pts)"
+        lineup.append((label, points or 0))
+    return sorted(lineup, key=lambda entry: entry[1], reverse=True)
+
+
+def _render_matchup_prompt(teams, lineups, is_championship):
+    if len(teams) == 2:
+        sections = []
+        for team, lineup in zip(teams, lineups):
+            section = f"Team {team.team_name} scored {team.points} points"
+            if lineup:
+                section += f", led by starters: {', '.join(label for label, _ in lineup)}"
+            sections.append(section + ".")
+        return (
+            f"In the {'championship' if is_championship else 'regular season'} fantasy football matchup, "
+            f"{' '.join(sections)} "
+            "Provide a funny and sarcastic sports commentary roast in the style of Chris Berman from ESPN."
+        )
+
+    section = f"Team {teams[0].team_name} played alone this week, scoring {teams[0].points} points"
+    if lineups[0]:
+        section += f", with starters: {', '.join(label for label, _ in lineups[0])}"
+    return f"{section}. Write a funny roast in Chris Berman's style."
+
+
+# Function to build a matchup roast prompt that fits the token budget.
+# Each team's starters are listed by that week's points; while the prompt is
+# over budget the lowest scorer is dropped from whichever lineup is longest.
+# Returns the prompt and its estimated token count.
+def build_matchup_prompt(teams, lineups, is_championship=False, budget=PROMPT_TOKEN_BUDGET):
+    lineups = [list(lineup) for lineup in lineups]
+    prompt = _render_matchup_prompt(teams, lineups, is_championship)
+    tokens = estimate_tokens(prompt)
+    while tokens > budget and any(lineups):
+        max(lineups, key=len).pop()
+        prompt = _render_matchup_prompt(teams, lineups, is_championship)
+        tokens = estimate_tokens(prompt)
+    return prompt, tokens
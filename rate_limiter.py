@@ -0,0 +1,108 @@
+import threading
+import time
+
+# Default OpenAI quota shared by every session in this process
+OPENAI_REQUESTS_PER_MINUTE = 200
+OPENAI_TOKENS_PER_MINUTE = 40000
+OPENAI_MAX_CONCURRENCY = 8
+
+# Successful calls needed before a throttled limiter allows one more request in flight
+RECOVERY_SUCCESSES = 5
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Function to get the seconds to wait until `amount` can be taken
+    def wait_time(self, amount):
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+
+# Token-bucket limiter for requests/min and tokens/min with adaptive concurrency.
+# Callers block in acquire() until quota is available instead of failing; a 429
+# pauses everyone for the server's Retry-After and halves the concurrency limit,
+# which then grows back by one after every RECOVERY_SUCCESSES successful calls.
+class AdaptiveRateLimiter:
+    def __init__(self, requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=OPENAI_TOKENS_PER_MINUTE, max_concurrency=OPENAI_MAX_CONCURRENCY):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, estimated_tokens):
+        with self._cond:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                    continue
+                if self.in_flight >= self.concurrency:
+                    self._cond.wait()
+                    continue
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+                self.in_flight += 1
+                return
+
+    # Function to hand back a slot, charging the difference if the call used more tokens than estimated
+    def release(self, estimated_tokens=0, used_tokens=None, success=True):
+        with self._cond:
+            self.in_flight -= 1
+            if used_tokens is not None and used_tokens > estimated_tokens:
+                self.tokens.consume(used_tokens - estimated_tokens)
+            if success and self.concurrency < self.max_concurrency:
+                self._successes += 1
+                if self._successes >= RECOVERY_SUCCESSES:
+                    self.concurrency += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def rate_limited(self, retry_after):
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.concurrency = max(1, self.concurrency // 2)
+            self._successes = 0
+            self._cond.notify_all()
+
+
+_openai_limiter = AdaptiveRateLimiter()
+
+
+def get_openai_limiter():
+    return _openai_limiter
+
+
+# Function to replace the process-wide OpenAI limits, e.g. from secrets.toml
+def configure_openai_limits(requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+                            tokens_per_minute=OPENAI_TOKENS_PER_MINUTE, max_concurrency=OPENAI_MAX_CONCURRENCY):
+    global _openai_limiter
+    limiter = _openai_limiter
+    if (limiter.requests.capacity, limiter.tokens.capacity, limiter.max_concurrency) != (
+        requests_per_minute, tokens_per_minute, max_concurrency
+    ):
+        _openai_limiter = AdaptiveRateLimiter(requests_per_minute, tokens_per_minute, max_concurrency)
+    return _openai_limiter
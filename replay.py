@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from urllib.parse import urlencode, urlparse
+
+import openai
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import http_client
+
+# Record/replay layer for running the pages offline. In "record" mode every Sleeper,
+# Giphy and image request, every OpenAI completion and every ESPN League/scoreboard
+# load goes to the real service and its response is saved under a fixture directory;
+# in "replay" mode the same calls are answered from those fixtures, after an injected
+# per-service latency, without touching the network. A call with no fixture raises
+# ReplayMiss. Secrets (API keys, ESPN cookies) are never written to fixtures.
+#
+#     import replay
+#     replay.install("fixtures/default", mode="replay", latency={"openai": 1.5})
+
+# Default injected latency per service, in seconds
+DEFAULT_LATENCY = {
+    "sleeper": 0.08,
+    "giphy": 0.1,
+    "image": 0.05,
+    "openai": 1.0,
+    "espn": 0.2,
+}
+
+# Characters per streamed chunk when a recorded completion is replayed with stream=True
+STREAM_CHUNK_CHARS = 16
+
+# Query parameters dropped from request keys and recorded URLs
+SECRET_PARAMS = {"api_key"}
+
+HTTP_INDEX = "http.json"
+OPENAI_FIXTURES = "openai.json"
+ESPN_FIXTURES = "espn.json"
+
+
+class ReplayMiss(KeyError):
+    def __str__(self):
+        return f"no replay fixture for {self.args[0]}"
+
+
+def _service_for(url):
+    host = urlparse(url).hostname or ""
+    if host.endswith("sleeper.app"):
+        return "sleeper"
+    if host.endswith("giphy.com"):
+        return "giphy"
+    return "image"
+
+
+def _http_key(url, params):
+    public = sorted((name, str(value)) for name, value in (params or {}).items() if name not in SECRET_PARAMS)
+    return f"GET {url}?{urlencode(public)}" if public else f"GET {url}"
+
+
+def _openai_key(model, messages):
+    return hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _response(status, body, headers, url):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response._content_consumed = True
+    response.headers = CaseInsensitiveDict(headers)
+    response.url = url
+    return response
+
+
+class Recorder:
+    def __init__(self, directory, mode="replay", latency=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode {mode!r}")
+        self.directory = directory
+        self.mode = mode
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        # Calls answered per service since install() or reset_counts()
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._http = self._load(HTTP_INDEX)
+        self._openai = self._load(OPENAI_FIXTURES)
+        self._espn = self._load(ESPN_FIXTURES)
+
+    def _load(self, name):
+        try:
+            with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except OSError:
+            return {}
+
+    def _save(self, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    def _wait(self, service):
+        with self._lock:
+            self.calls[service] += 1
+        if self.mode == "replay" and self.latency.get(service):
+            time.sleep(self.latency[service])
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls.clear()
+
+    # HTTP (Sleeper, player dump, Giphy, avatars and logos) ------------------------
+
+    def http_get(self, session, url, params=None, **kwargs):
+        service = _service_for(url)
+        key = _http_key(url, params)
+        self._wait(service)
+        if self.mode == "replay":
+            entry = self._http.get(key)
+            if entry is None:
+                raise ReplayMiss(key)
+            with open(os.path.join(self.directory, "http", entry["body"]), "rb") as f:
+                body = f.read()
+            return _response(entry["status"], body, entry["headers"], url)
+
+        # Record without validators so the fixture always holds a full body
+        kwargs.pop("headers", None)
+        kwargs.pop("stream", None)
+        response = session.get(url, params=params, **kwargs)
+        body_name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        os.makedirs(os.path.join(self.directory, "http"), exist_ok=True)
+        with open(os.path.join(self.directory, "http", body_name), "wb") as f:
+            f.write(response.content)
+        headers = {name: response.headers[name] for name in ("Content-Type", "ETag", "Last-Modified") if name in response.headers}
+        with self._lock:
+            self._http[key] = {"status": response.status_code, "headers": headers, "body": body_name}
+            self._save(HTTP_INDEX, self._http)
+        return response
+
+    # OpenAI ChatCompletion ---------------------------------------------------------
+
+    def chat_completion(self, create, model, messages, stream=False, **kwargs):
+        key = _openai_key(model, messages)
+        self._wait("openai")
+        if self.mode == "replay":
+            entry = self._openai.get(key)
+            if entry is None:
+                raise ReplayMiss(f"openai {key}")
+        else:
+            response = create(model=model, messages=messages, **kwargs)
+            entry = {
+                "content": response["choices"][0]["message"]["content"],
+                "total_tokens": response.get("usage", {}).get("total_tokens"),
+            }
+            with self._lock:
+                self._openai[key] = entry
+                self._save(OPENAI_FIXTURES, self._openai)
+
+        if stream:
+            content = entry["content"]
+            return iter([
+                {"choices": [{"delta": {"content": content[i:i + STREAM_CHUNK_CHARS]}}]}
+                for i in range(0, len(content), STREAM_CHUNK_CHARS)
+            ])
+        return {
+            "choices": [{"message": {"content": entry["content"]}}],
+            "usage": {"total_tokens": entry["total_tokens"]},
+        }
+
+    # ESPN League and scoreboard ----------------------------------------------------
+
+    def espn_league(self, league_class, league_id, year, espn_s2=None, swid=None):
+        key = f"{league_id}:{year}"
+        self._wait("espn")
+        if self.mode == "replay":
+            if key not in self._espn:
+                raise ReplayMiss(f"espn {key}")
+            return _FixtureLeague(self, self._espn[key])
+
+        league = league_class(league_id=league_id, year=year, espn_s2=espn_s2, swid=swid)
+        with self._lock:
+            self._espn[key] = {
+                "current_week": league.current_week,
+                "currentMatchupPeriod": getattr(league, "currentMatchupPeriod", league.current_week),
+                "scoreboards": self._espn.get(key, {}).get("scoreboards", {}),
+            }
+            self._save(ESPN_FIXTURES, self._espn)
+        return _RecordingLeague(self, key, league)
+
+    def _record_scoreboard(self, key, week, matchups):
+        def team(espn_team):
+            if not espn_team:
+                return None
+            return {"team_id": espn_team.team_id, "team_name": espn_team.team_name, "logo_url": espn_team.logo_url}
+
+        with self._lock:
+            self._espn[key]["scoreboards"][str(week)] = [
+                {
+                    "home_team": team(matchup.home_team),
+                    "away_team": team(matchup.away_team),
+                    "home_score": matchup.home_score,
+                    "away_score": matchup.away_score,
+                    "is_playoff": getattr(matchup, "is_playoff", False),
+                }
+                for matchup in matchups
+            ]
+            self._save(ESPN_FIXTURES, self._espn)
+
+
+class _RecordingLeague:
+    def __init__(self, recorder, key, league):
+        self._recorder = recorder
+        self._key = key
+        self._league = league
+
+    def __getattr__(self, name):
+        return getattr(self._league, name)
+
+    def scoreboard(self, week=None):
+        self._recorder._wait("espn")
+        matchups = self._league.scoreboard(week=week)
+        self._recorder._record_scoreboard(self._key, week, matchups)
+        return matchups
+
+
+class _FixtureLeague:
+    def __init__(self, recorder, fixture):
+        self._recorder = recorder
+        self._fixture = fixture
+        self.current_week = fixture["current_week"]
+        self.currentMatchupPeriod = fixture["currentMatchupPeriod"]
+
+    def scoreboard(self, week=None):
+        self._recorder._wait("espn")
+        matchups = self._fixture["scoreboards"].get(str(week))
+        if matchups is None:
+            raise ReplayMiss(f"espn scoreboard week {week}")
+        return [
+            SimpleNamespace(
+                home_team=SimpleNamespace(**matchup["home_team"]) if matchup["home_team"] else None,
+                away_team=SimpleNamespace(**matchup["away_team"]) if matchup["away_team"] else None,
+                home_score=matchup["home_score"],
+                away_score=matchup["away_score"],
+                is_playoff=matchup["is_playoff"],
+            )
+            for matchup in matchups
+        ]
+
+
+class _ReplaySession:
+    def __init__(self, recorder, session):
+        self._recorder = recorder
+        self._session = session
+
+    def get(self, url, params=None, **kwargs):
+        return self._recorder.http_get(self._session, url, params=params, **kwargs)
+
+
+_recorder = None
+
+
+# Function to route every external call through fixtures in `directory`. Must run
+# before the first ESPN League is created, since espn.py caches League handles.
+# `session` overrides the requests session used for recording.
+def install(directory, mode="replay", latency=None, session=None):
+    global _recorder
+    _recorder = Recorder(directory, mode=mode, latency=latency)
+
+    if session is None and mode == "record":
+        session = requests.Session()
+    http_client._session = http_client._no_retry_session = _ReplaySession(_recorder, session)
+
+    create = openai.ChatCompletion.create
+    openai.ChatCompletion.create = lambda model, messages, stream=False, **kwargs: _recorder.chat_completion(
+        create, model, messages, stream=stream, **kwargs
+    )
+
+    try:
+        import espn_api.football
+    except ImportError:
+        pass
+    else:
+        league_class = espn_api.football.League
+        espn_api.football.League = lambda league_id, year, espn_s2=None, swid=None: _recorder.espn_league(
+            league_class, league_id, year, espn_s2=espn_s2, swid=swid
+        )
+    return _recorder
+
+
+# Function to get the installed recorder, or None when calls go to the real services
+def get_recorder():
+    return _recorder
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Path to the on-disk roast cache
+ROAST_CACHE_FILE = "roast_cache.sqlite3"
+
+# Total size of cached text kept before least-recently-used entries are evicted
+ROAST_CACHE_MAX_BYTES = 20 * 1024 * 1024
+
+# Entries older than this many seconds are ignored (None keeps them until evicted)
+ROAST_CACHE_TTL = None
+
+
+# Function to build a content-addressed key for a completion request
+def roast_cache_key(model, system_message, prompt):
+    payload = json.dumps([model, system_message, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RoastCache:
+    def __init__(self, path=ROAST_CACHE_FILE, max_bytes=ROAST_CACHE_MAX_BYTES, ttl=ROAST_CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS roasts ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS roasts_accessed ON roasts (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Function to look up a cached completion, refreshing its LRU position
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT text, created_at FROM roasts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            text, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                conn.execute("DELETE FROM roasts WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE roasts SET accessed_at = ? WHERE key = ?", (now, key))
+            return text
+
+    # Function to store a completion and evict the oldest entries over the size budget
+    def put(self, key, text):
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO roasts (key, text, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now),
+            )
+            if self.ttl is not None:
+                conn.execute("DELETE FROM roasts WHERE created_at < ?", (now - self.ttl,))
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM roasts").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_size in conn.execute(
+                    "SELECT key, size FROM roasts WHERE key != ? ORDER BY accessed_at", (key,)
+                ).fetchall():
+                    conn.execute("DELETE FROM roasts WHERE key = ?", (old_key,))
+                    total -= old_size
+                    if total <= self.max_bytes:
+                        break
+
+    def delete(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM roasts WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM roasts")
@@ -0,0 +1,246 @@
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_builder import estimate_tokens
+from rate_limiter import configure_openai_limits, get_openai_limiter
+from roast_cache import RoastCache, roast_cache_key
+from tracing import add_bytes, mark_cache, span
+
+# Default model used for roasts and recaps
+DEFAULT_MODEL = "gpt-4"
+
+# Maximum number of OpenAI requests kept in flight at once
+MAX_IN_FLIGHT = 4
+
+# Minimum number of seconds between streamed text updates pushed to the page
+STREAM_UPDATE_INTERVAL = 0.1
+
+# Completion tokens reserved per request when estimating its cost up front
+COMPLETION_TOKEN_ESTIMATE = 400
+
+# Times a rate-limited request is re-queued before the error is surfaced
+MAX_RATE_LIMIT_RETRIES = 8
+
+# 429 error codes that waiting will not fix (exhausted quota or billing), surfaced at once
+NON_RETRYABLE_RATE_LIMIT_CODES = {"insufficient_quota", "billing_hard_limit_reached", "access_terminated"}
+
+
+_roast_cache = None
+_roast_cache_lock = threading.Lock()
+
+# The openai package (and the aiohttp stack under it) is only imported when a request
+# actually has to go out, so pages served from the roast cache or from precomputed
+# artifacts start without it
+_openai_api_key = None
+
+
+# Function to set the API key used once the OpenAI client is imported
+def set_openai_api_key(api_key):
+    global _openai_api_key
+    _openai_api_key = api_key
+
+
+# Function to apply the [openai] secrets (API key, shared rate limits for every session
+# in this process) and return the maximum number of concurrent OpenAI requests per page.
+# Pages call it when they render, so importing them never parses secrets.toml.
+def configure_openai():
+    import streamlit as st
+
+    openai_secrets = st.secrets["openai"]
+    set_openai_api_key(openai_secrets["api_key"])
+    configure_openai_limits(**openai_secrets.get("rate_limits", {}))
+    return openai_secrets.get("max_in_flight", MAX_IN_FLIGHT)
+
+
+def _openai():
+    import openai
+
+    if _openai_api_key is not None:
+        openai.api_key = _openai_api_key
+    return openai
+
+
+# Function to get the process-wide roast cache, opening it on first use
+def get_roast_cache():
+    global _roast_cache
+    with _roast_cache_lock:
+        if _roast_cache is None:
+            _roast_cache = RoastCache()
+        return _roast_cache
+
+
+# Function to attach the caller's Streamlit script context to pool threads,
+# so worker threads can still write to placeholders created by the page
+def _streamlit_context_initializer():
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return None
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    return lambda: add_script_run_ctx(threading.current_thread(), ctx)
+
+
+# Function to run a callable over items with a bounded worker pool, keeping input order.
+# Each item runs in a copy of the caller's context, so tracing spans reach the page run.
+def run_bounded(func, items, max_in_flight=MAX_IN_FLIGHT):
+    items = list(items)
+    if max_in_flight <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(
+        max_workers=min(max_in_flight, len(items)),
+        initializer=_streamlit_context_initializer(),
+    ) as pool:
+        return list(pool.map(lambda context, item: context.run(func, item), contexts, items))
+
+
+# Function to read how long OpenAI asked us to back off, falling back to exponential backoff
+def _retry_after(error, attempt):
+    headers = {name.lower(): value for name, value in (getattr(error, "headers", None) or {}).items()}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return min(60, 2 ** attempt)
+
+
+# Function to check whether a 429 is a real rate limit rather than an exhausted quota
+def _is_retryable_rate_limit(error):
+    body = getattr(error, "json_body", None)
+    details = body.get("error") if isinstance(body, dict) else None
+    details = details if isinstance(details, dict) else {}
+    codes = {getattr(error, "code", None), details.get("code"), details.get("type")}
+    return not codes & NON_RETRYABLE_RATE_LIMIT_CODES
+
+
+# Function to run an OpenAI request under the shared rate limiter, queueing on 429s
+# instead of failing. `request` returns (text, used_tokens or None).
+def _call_with_rate_limit(request, estimated_tokens):
+    openai = _openai()
+    limiter = get_openai_limiter()
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(estimated_tokens)
+        try:
+            text, used_tokens = request()
+        except openai.error.RateLimitError as e:
+            limiter.release(estimated_tokens, success=False)
+            if attempt == MAX_RATE_LIMIT_RETRIES or not _is_retryable_rate_limit(e):
+                raise
+            limiter.rate_limited(_retry_after(e, attempt))
+            continue
+        except BaseException:
+            limiter.release(estimated_tokens, success=False)
+            raise
+        limiter.release(estimated_tokens, used_tokens)
+        return text
+
+
+# Function to request a single chat completion and return its text,
+# serving repeated (model, system message, prompt) requests from the roast cache.
+# When `on_text` is given the completion is streamed and `on_text` receives the
+# text generated so far as tokens arrive.
+def generate_completion(system_message, prompt, model=DEFAULT_MODEL, force_refresh=False, on_text=None):
+    with span("openai.completion", model=model, stream=on_text is not None):
+        return _generate_completion(system_message, prompt, model, force_refresh, on_text)
+
+
+def _generate_completion(system_message, prompt, model, force_refresh, on_text):
+    cache = get_roast_cache()
+    key = roast_cache_key(model, system_message, prompt)
+    if not force_refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            mark_cache(True)
+            if on_text:
+                on_text(cached)
+            return cached
+    mark_cache(False)
+
+    openai = _openai()
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt}
+    ]
+
+    def request():
+        if on_text is None:
+            response = openai.ChatCompletion.create(model=model, messages=messages)
+            used_tokens = response.get("usage", {}).get("total_tokens")
+            return response["choices"][0]["message"]["content"].strip(), used_tokens
+
+        parts = []
+        last_update = 0
+        for chunk in openai.ChatCompletion.create(model=model, messages=messages, stream=True):
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+            if not delta:
+                continue
+            parts.append(delta)
+            # Throttle UI updates so long roasts don't flood the page with deltas
+            if time.monotonic() - last_update >= STREAM_UPDATE_INTERVAL:
+                on_text("".join(parts))
+                last_update = time.monotonic()
+        text = "".join(parts).strip()
+        on_text(text)
+        # Streamed responses carry no usage block, so charge the estimate
+        return text, None
+
+    estimated_tokens = estimate_tokens(system_message) + estimate_tokens(prompt) + COMPLETION_TOKEN_ESTIMATE
+    text = _call_with_rate_limit(request, estimated_tokens)
+    add_bytes(len(text.encode("utf-8")))
+    cache.put(key, text)
+    return text
+
+
+# Function to parse a batch completion into {key: text}, keeping only well-formed entries
+def _parse_batch_response(raw_text, expected_keys, key_name, text_name):
+    text = raw_text.strip()
+    # Models sometimes wrap JSON in a Markdown code fence
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        key = expected_keys.get(str(entry.get(key_name)))
+        value = entry.get(text_name)
+        if key is not None and isinstance(value, str) and value.strip():
+            results[key] = value.strip()
+    return results
+
+
+# Function to generate many completions that share a system message in one request.
+# `items` is a list of (key, prompt) pairs; the model is asked for a JSON array of
+# {key_name: key, text_name: text} objects. Returns {key: text} for the entries that
+# came back well-formed, so callers can fall back to per-item calls for the rest.
+def generate_batch(system_message, items, key_name, text_name, model=DEFAULT_MODEL, force_refresh=False):
+    if not items:
+        return {}
+    batch_prompt = (
+        f"Complete each of the following requests. Respond with only a JSON array containing one object "
+        f"per request, in the form {{\"{key_name}\": <the request's {key_name}>, \"{text_name}\": <your response>}}. "
+        f"Do not include any text outside the JSON array.\n\n"
+        + json.dumps([{key_name: key, "request": prompt} for key, prompt in items], ensure_ascii=False)
+    )
+    raw_text = generate_completion(system_message, batch_prompt, model=model, force_refresh=force_refresh)
+    results = _parse_batch_response(raw_text, {str(key): key for key, _ in items}, key_name, text_name)
+    if not results:
+        # Don't keep serving an unusable batch response from the cache
+        get_roast_cache().delete(roast_cache_key(model, system_message, batch_prompt))
+    return results
@@ -0,0 +1,126 @@
+import numpy as np
+
+
+# Columnar season table built from raw Sleeper matchup payloads.
+#
+# Starter performances are stored as parallel arrays (week, roster, player,
+# points), one row per starter per week, and team scores as a dense
+# week x roster matrix, so season queries are vectorized array operations.
+class SeasonTable:
+    def __init__(self, season_matchups):
+        self.weeks = np.array(sorted(season_matchups), dtype=np.int16)
+        week_index = {int(week): i for i, week in enumerate(self.weeks)}
+
+        roster_ids = sorted({
+            matchup["roster_id"]
+            for matchups in season_matchups.values()
+            for matchup in matchups or []
+            if matchup.get("roster_id") is not None
+        })
+        self.roster_ids = np.array(roster_ids)
+        self._roster_index = {roster_id: i for i, roster_id in enumerate(roster_ids)}
+
+        self.player_ids = []
+        self._player_index = {}
+        week_col, roster_col, player_col, points_col = [], [], [], []
+
+        self.team_points = np.zeros((len(self.weeks), len(roster_ids)), dtype=np.float64)
+        for week, matchups in season_matchups.items():
+            w = week_index[int(week)]
+            for matchup in matchups or []:
+                roster_id = matchup.get("roster_id")
+                if roster_id is None:
+                    continue
+                r = self._roster_index[roster_id]
+                self.team_points[w, r] = matchup.get("points") or 0
+
+                starters = matchup.get("starters") or []
+                starters_points = matchup.get("starters_points") or []
+                players_points = matchup.get("players_points") or {}
+                for slot, player_id in enumerate(starters):
+                    # Empty lineup slots come through as "0"
+                    if not player_id or player_id == "0":
+                        continue
+                    if slot < len(starters_points):
+                        points = starters_points[slot]
+                    else:
+                        points = players_points.get(player_id, 0)
+
+                    if player_id not in self._player_index:
+                        self._player_index[player_id] = len(self.player_ids)
+                        self.player_ids.append(player_id)
+                    week_col.append(w)
+                    roster_col.append(r)
+                    player_col.append(self._player_index[player_id])
+                    points_col.append(points or 0)
+
+        self.week_col = np.array(week_col, dtype=np.int16)
+        self.roster_col = np.array(roster_col, dtype=np.int16)
+        self.player_col = np.array(player_col, dtype=np.int32)
+        self.points_col = np.array(points_col, dtype=np.float64)
+
+        # Weeks where nobody has scored yet are treated as not played
+        self.played_weeks = self.team_points.any(axis=1)
+
+    # Function to get the top-N starters for a team by points scored while starting for it
+    def top_players(self, roster_id, n=3):
+        r = self._roster_index.get(roster_id)
+        if r is None:
+            return []
+        mask = self.roster_col == r
+        totals = np.bincount(self.player_col[mask], weights=self.points_col[mask], minlength=len(self.player_ids))
+        order = np.argsort(-totals, kind="stable")[:n]
+        return [(self.player_ids[i], round(float(totals[i]), 2)) for i in order if totals[i] > 0]
+
+    # Function to get season point totals for every team
+    def season_totals(self):
+        totals = self.team_points.sum(axis=0)
+        return {roster_id: round(float(total), 2) for roster_id, total in zip(self.roster_ids.tolist(), totals)}
+
+    def season_total(self, roster_id):
+        r = self._roster_index.get(roster_id)
+        return 0 if r is None else round(float(self.team_points[:, r].sum()), 2)
+
+    # Function to get the highest and lowest scoring team for each played week
+    def weekly_highs_lows(self):
+        if not len(self.roster_ids) or not self.played_weeks.any():
+            return []
+        played = self.team_points[self.played_weeks]
+        weeks = self.weeks[self.played_weeks].tolist()
+        highs = played.argmax(axis=1)
+        lows = played.argmin(axis=1)
+        return [
+            {
+                "week": week,
+                "high": (self.roster_ids[hi].item(), float(row[hi])),
+                "low": (self.roster_ids[lo].item(), float(row[lo])),
+            }
+            for week, row, hi, lo in zip(weeks, played, highs, lows)
+        ]
+
+    # Function to find a team's boom and bust weeks, i.e. scores more than
+    # `threshold` standard deviations above or below its own season average
+    def boom_bust_weeks(self, roster_id, threshold=1.0):
+        r = self._roster_index.get(roster_id)
+        if r is None or not self.played_weeks.any():
+            return {"boom": [], "bust": []}
+        scores = self.team_points[self.played_weeks, r]
+        weeks = self.weeks[self.played_weeks]
+        std = scores.std()
+        if std == 0:
+            return {"boom": [], "bust": []}
+        z = (scores - scores.mean()) / std
+        return {
+            "boom": [(int(week), float(score)) for week, score in zip(weeks[z >= threshold], scores[z >= threshold])],
+            "bust": [(int(week), float(score)) for week, score in zip(weeks[z <= -threshold], scores[z <= -threshold])],
+        }
+
+    # Function to get a team's best and worst played week
+    def best_and_worst_week(self, roster_id):
+        r = self._roster_index.get(roster_id)
+        if r is None or not self.played_weeks.any():
+            return None, None
+        scores = self.team_points[self.played_weeks, r]
+        weeks = self.weeks[self.played_weeks]
+        best, worst = scores.argmax(), scores.argmin()
+        return (int(weeks[best]), float(scores[best])), (int(weeks[worst]), float(scores[worst]))
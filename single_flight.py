@@ -0,0 +1,54 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Coalesces concurrent calls that share a key: the first caller runs the
+# function and every caller that arrives while it is running waits for and
+# receives the same result (or exception) instead of repeating the work.
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+
+            if leader:
+                try:
+                    call.result = func(*args, **kwargs)
+                    return call.result
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+
+            call.done.wait()
+            if call.error is None:
+                return call.result
+            if isinstance(call.error, Exception):
+                raise call.error
+            # The leader's script run was stopped or rerun by Streamlit;
+            # that is not our failure, so run the work ourselves instead
+            continue
+
+
+_group = SingleFlight()
+
+
+# Function to run `func` once per key across all concurrent sessions in this process
+def single_flight(key, func, *args, **kwargs):
+    return _group.do(key, func, *args, **kwargs)
@@ -1,110 +1,42 @@
 import streamlit as st
-import openai
-import random
-import requests
-import os
-import json
-from sleeper.api import (
-    get_matchups_for_week,
-    get_rosters,
-    get_users_in_league,
+import time
+from artifacts import load_week_artifact
+from gif_pool import fetch_random_gif, giphy_api_key, prefetch_gif_pools
+from image_cache import prefetch_thumbnails, thumbnail
+from league_cache import (
+    get_team_mapping_with_players,
+    league_cached,
+    load_league_matchups,
+    load_player_index,
+    refresh_league_button,
+    select_league,
 )
+from live_tracker import (
+    LIVE_POLL_INTERVAL,
+    LIVE_ROASTS_TTL,
+    REROAST_MARGIN_THRESHOLD,
+    LiveRoasts,
+    score_deltas,
+    snapshot_scores,
+)
+from models import MatchupTeam, Team
+from prompt_builder import PROMPT_TOKEN_BUDGET, build_matchup_prompt, starting_lineup
+from roast_engine import MAX_IN_FLIGHT, configure_openai, generate_batch, generate_completion, run_bounded
+from single_flight import single_flight
+from tracing import collect_spans, profiler_sidebar, span
 
-# Access the OpenAI API key from secrets.toml
-api_key = st.secrets["openai"]["api_key"]
-openai.api_key = api_key
-
-# Giphy API Key
-GIPHY_API_KEY = st.secrets.get("giphy", {}).get("api_key", None)
-
-# Set your Sleeper league ID
+# Sleeper league shown when the session has not picked one
 LEAGUE_ID = "1125204823692955648"
 
-# Path to the player cache file
-PLAYER_CACHE_FILE = "players_cache.json"
-
-# Function to fetch and cache player data
-def fetch_and_cache_players():
-    if os.path.exists(PLAYER_CACHE_FILE):
-        try:
-            with open(PLAYER_CACHE_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            st.warning(f"Cache file corrupted. Re-fetching player data. Error: {e}")
-
-    # Fetch data from Sleeper API
-    response = requests.get("https://api.sleeper.app/v1/players/nfl")
-    if response.status_code == 200:
-        player_data = response.json()
-        with open(PLAYER_CACHE_FILE, "w") as f:
-            json.dump(player_data, f)
-        return player_data
-    else:
-        st.error(f"Error fetching player data: {response.status_code}")
-        return {}
-
-# Function to fetch avatars for users
-def fetch_avatar(avatar_id):
-    if avatar_id:
-        return f"https://sleepercdn.com/avatars/{avatar_id}"  # Sleeper avatar URL
-    return "https://via.placeholder.com/150.png?text=No+Avatar"
-
-# Function to fetch random Giphy
-def fetch_random_gif(query="nfl celebration"):
-    if not GIPHY_API_KEY:
-        return "https://via.placeholder.com/300x200.png?text=No+GIF+Available"
-    try:
-        url = f"https://api.giphy.com/v1/gifs/search?api_key={GIPHY_API_KEY}&q={query}&limit=10&offset=0&rating=g&lang=en"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            gifs = [gif["images"]["original"]["url"] for gif in data.get("data", [])]
-            return random.choice(gifs) if gifs else "https://via.placeholder.com/300x200.png?text=No+GIFs"
-        else:
-            return "https://via.placeholder.com/300x200.png?text=GIF+Fetch+Error"
-    except Exception:
-        return "https://via.placeholder.com/300x200.png?text=GIF+Error"
-
-# Function to fetch team mapping with player details
-def get_team_mapping_with_players(player_data):
-    try:
-        league_users = get_users_in_league(league_id=LEAGUE_ID)
-        league_rosters = get_rosters(league_id=LEAGUE_ID)
-
-        user_mapping = {
-            user["user_id"]: {
-                "name": user.get("display_name", f"User {user['user_id']}"),
-                "avatar": fetch_avatar(user.get("avatar"))
-            }
-            for user in league_users
-        }
-
-        team_mapping = {}
-        for roster in league_rosters:
-            players = [
-                {
-                    "player_id": player_id,
-                    "details": player_data.get(player_id, {"name": "Unknown Player"})
-                }
-                for player_id in roster.get("players", [])
-            ]
-            team_mapping[roster["roster_id"]] = {
-                "team_name": roster.get("metadata", {}).get(
-                    "team_name",
-                    user_mapping.get(roster["owner_id"], {}).get("name", f"Team {roster['roster_id']}")
-                ),
-                "avatar": user_mapping.get(roster["owner_id"], {}).get("avatar"),
-                "players": players,
-            }
-        return team_mapping
-    except Exception as e:
-        st.error(f"Error fetching league rosters or users: {e}")
-        return {}
+# System persona used for matchup roasts
+ROAST_SYSTEM_MESSAGE = "You are Chris Berman, a witty and funny sports commentator."
 
 # Function to fetch matchups for a given week
-def get_matchups_with_teams(week, team_mapping):
+def get_matchups_with_teams(week, team_mapping, league_id=LEAGUE_ID):
     try:
-        matchups = get_matchups_for_week(league_id=LEAGUE_ID, week=week)
+        # Concurrent viewers of the same week share one Sleeper request
+        with span("sleeper.matchups", league=league_id, week=week):
+            matchups = load_league_matchups(league_id, week)
         if not matchups or not isinstance(matchups, list):
             st.error(f"No valid matchups returned for week {week}.")
             return {}
@@ -118,117 +50,273 @@ def get_matchups_with_teams(week, team_mapping):
             if matchup_id is None or roster_id is None:
                 continue
 
-            team_data = team_mapping.get(roster_id, {"team_name": f"Team {roster_id}", "avatar": None})
+            team_data = team_mapping.get(roster_id) or Team(roster_id, f"Team {roster_id}")
 
             if matchup_id not in matchups_with_teams:
                 matchups_with_teams[matchup_id] = []
 
-            matchups_with_teams[matchup_id].append({
-                'team_name': team_data["team_name"],
-                'avatar': team_data["avatar"],
-                'points': points
-            })
+            matchups_with_teams[matchup_id].append(MatchupTeam(
+                roster_id,
+                team_data.team_name,
+                avatar=team_data.avatar,
+                points=points,
+                starters=matchup.get('starters') or [],
+                starters_points=matchup.get('starters_points') or [],
+                players_points=matchup.get('players_points'),
+            ))
 
         return dict(sorted(matchups_with_teams.items()))
     except Exception as e:
         st.error(f"Error fetching matchups for week {week}: {e}")
         return {}
 
-def generate_roasts_with_players(matchups, team_mapping, is_championship=False):
-    roasts = []
+def generate_roasts_with_players(matchups, team_mapping, is_championship=False,
+                                 max_in_flight=MAX_IN_FLIGHT, force_refresh=False, on_update=None, batch=False,
+                                 token_budget=PROMPT_TOKEN_BUDGET):
+    jobs = []
     for matchup_id, teams in matchups.items():
-        if len(teams) == 2:
-            team1, team2 = teams[0], teams[1]
-            team1_roster_id = team1.get('roster_id', None)
-            team2_roster_id = team2.get('roster_id', None)
-
-            # Ensure roster IDs are valid
-            team1_roster_id = team1_roster_id if isinstance(team1_roster_id, (str, int)) else None
-            team2_roster_id = team2_roster_id if isinstance(team2_roster_id, (str, int)) else None
-
-            # Extract players
-            team1_players = [f"{p['details'].get('first_name', '')} {p['details'].get('last_name', '')} ({p['details'].get('position', '')})"
-                             for p in team_mapping.get(team1_roster_id, {}).get("players", [])]
-            team2_players = [f"{p['details'].get('first_name', '')} {p['details'].get('last_name', '')} ({p['details'].get('position', '')})"
-                             for p in team_mapping.get(team2_roster_id, {}).get("players", [])]
-
-            # Construct the prompt with player details
-            prompt = (
-                f"In the {'championship' if is_championship else 'regular season'} fantasy football matchup, "
-                f"Team {team1['team_name']} scored {team1['points']} points, led by players: {', '.join(team1_players)}. "
-                f"Team {team2['team_name']} scored {team2['points']} points, led by players: {', '.join(team2_players)}. "
-                "Provide a funny and sarcastic sports commentary roast in the style of Chris Berman from ESPN."
-            )
-        else:
-            # Handle matchups with only one team
-            prompt = (
-                f"Team {teams[0]['team_name']} played alone this week, scoring {teams[0]['points']} points. "
-                "Write a funny roast in Chris Berman's style."
-            )
+        # This week's starters and their points, best first
+        lineups = []
+        for team in teams:
+            roster = team_mapping.get(team.roster_id)
+            lineups.append(starting_lineup(team, roster.players if roster else {}))
+
+        # Construct the prompt, trimming the lineups to fit the token budget
+        prompt, prompt_tokens = build_matchup_prompt(teams, lineups, is_championship=is_championship, budget=token_budget)
 
         # Print the prompt for debugging purposes
-        print(f"Generated prompt for matchup {matchup_id}:\n{prompt}\n")
+        print(f"Generated prompt for matchup {matchup_id} (~{prompt_tokens} tokens):\n{prompt}\n")
+        jobs.append((matchup_id, prompt))
 
+    def roast_matchup(job):
+        matchup_id, prompt = job
+        # Stream partial roasts to the caller when it wants live updates
+        on_text = (lambda text: on_update(matchup_id, text)) if on_update else None
         try:
             # Call OpenAI API to generate the roast
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are Chris Berman, a witty and funny sports commentator."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            roast_text = response["choices"][0]["message"]["content"].strip()
-            roasts.append({'matchup_id': matchup_id, 'roast': roast_text})
+            roast_text = generate_completion(ROAST_SYSTEM_MESSAGE, prompt, force_refresh=force_refresh, on_text=on_text)
+            return {'matchup_id': matchup_id, 'roast': roast_text}
         except Exception as e:
             # Fallback for API errors
-            roasts.append({'matchup_id': matchup_id, 'roast': f"Error generating roast: {str(e)}"})
+            return {'matchup_id': matchup_id, 'roast': f"Error generating roast: {str(e)}", 'error': True}
 
-    return roasts
+    batch_roasts = {}
+    if batch:
+        # One request for the whole week; anything missing or malformed is roasted individually below
+        try:
+            batch_roasts = generate_batch(ROAST_SYSTEM_MESSAGE, jobs, "matchup_id", "roast", force_refresh=force_refresh)
+        except Exception as e:
+            print(f"Batch roast request failed, falling back to per-matchup calls: {e}")
+        for matchup_id, roast_text in batch_roasts.items():
+            if on_update:
+                on_update(matchup_id, roast_text)
+
+    # Roast remaining matchups concurrently; results come back in matchup order
+    remaining = run_bounded(
+        roast_matchup, [job for job in jobs if job[0] not in batch_roasts], max_in_flight=max_in_flight
+    )
+    roasts = {roast['matchup_id']: roast for roast in remaining}
+    return [
+        roasts.get(matchup_id) or {'matchup_id': matchup_id, 'roast': batch_roasts[matchup_id]}
+        for matchup_id, _ in jobs
+    ]
+
+# Function to render a matchup's header, logos and GIF, returning a placeholder for its roast
+def render_matchup_shell(teams, used_gifs):
+    if len(teams) == 2:
+        home_team = teams[0].team_name
+        away_team = teams[1].team_name
+        home_score = teams[0].points
+        away_score = teams[1].points
+        home_logo = teams[0].avatar
+        away_logo = teams[1].avatar
+
+        st.markdown(f"### {home_team} ({home_score}) vs {away_team} ({away_score})")
+        cols = st.columns(2)
+        with cols[0]:
+            if home_logo:
+                st.image(thumbnail(home_logo), width=100, caption=home_team)
+        with cols[1]:
+            if away_logo:
+                st.image(thumbnail(away_logo), width=100, caption=away_team)
+
+        roast_placeholder = st.empty()
+        gif_url = fetch_random_gif(query="nfl celebration", used=used_gifs)
+    else:
+        st.markdown(f"### {teams[0].team_name} played alone")
+        st.image(thumbnail(teams[0].avatar), width=100, caption=teams[0].team_name)
+        roast_placeholder = st.empty()
+        gif_url = fetch_random_gif(query="epic fail", used=used_gifs)
+
+    st.image(gif_url, use_column_width=True)
+    return roast_placeholder
 
 # Function to display matchups with logos and scores
 def display_matchup_with_logos(matchups, roasts):
+    used_gifs = set()
     for roast in roasts:
-        matchup_id = roast['matchup_id']
-        roast_text = roast['roast']
-        teams = matchups.get(matchup_id, [])
-
-        if len(teams) == 2:
-            home_team = teams[0]['team_name']
-            away_team = teams[1]['team_name']
-            home_score = teams[0]['points']
-            away_score = teams[1]['points']
-            home_logo = teams[0]['avatar']
-            away_logo = teams[1]['avatar']
-
-            st.markdown(f"### {home_team} ({home_score}) vs {away_team} ({away_score})")
-            cols = st.columns(2)
-            with cols[0]:
-                if home_logo:
-                    st.image(home_logo, width=100, caption=home_team)
-            with cols[1]:
-                if away_logo:
-                    st.image(away_logo, width=100, caption=away_team)
-
-            st.markdown(f"**Roast:** {roast_text}")
-            gif_url = fetch_random_gif(query=f"nfl celebration")
-            st.image(gif_url, use_column_width=True)
-        else:
-            st.markdown(f"### {teams[0]['team_name']} played alone")
-            st.image(teams[0]['avatar'], width=100, caption=teams[0]['team_name'])
-            st.markdown(f"**Roast:** {roast_text}")
-            gif_url = fetch_random_gif(query=f"epic fail")
-            st.image(gif_url, use_column_width=True)
+        teams = matchups.get(roast['matchup_id'], [])
+        render_matchup_shell(teams, used_gifs).markdown(f"**Roast:** {roast['roast']}")
+
+# Function to draw every matchup immediately and stream each roast into it as it is written
+def stream_matchups_with_logos(matchups, team_mapping, week=None, is_championship=False,
+                               max_in_flight=MAX_IN_FLIGHT, force_refresh=False, batch=False, league_id=LEAGUE_ID):
+    used_gifs = set()
+    placeholders = {}
+    for matchup_id, teams in matchups.items():
+        placeholders[matchup_id] = render_matchup_shell(teams, used_gifs)
+        placeholders[matchup_id].markdown("**Roast:** _Warming up the mic..._")
+
+    def show_roast(matchup_id, roast_text):
+        placeholders[matchup_id].markdown(f"**Roast:** {roast_text}")
+
+    # Concurrent viewers of the same week and scores share one generation run; only the
+    # first viewer sees tokens stream in, the others receive the finished roasts
+    scores = tuple((matchup_id, tuple(team.points for team in teams)) for matchup_id, teams in matchups.items())
+    roasts = single_flight(
+        (league_id, week, "roasts", scores, is_championship, force_refresh, batch),
+        generate_roasts_with_players,
+        matchups, team_mapping, is_championship=is_championship,
+        max_in_flight=max_in_flight, force_refresh=force_refresh, on_update=show_roast, batch=batch
+    )
+    # Make sure every placeholder ends on the final text, including error fallbacks
+    for roast in roasts:
+        show_roast(roast['matchup_id'], roast['roast'])
+    return roasts
+
+# Function to render one matchup in live mode, flagging the scores that just moved
+def render_live_matchup(teams, roast_text, deltas=None):
+    labels = []
+    for team, delta in zip(teams, deltas or (0,) * len(teams)):
+        label = f"{team.team_name} ({team.points})"
+        if delta:
+            label += f" {'▲' if delta > 0 else '▼'}{abs(delta)}"
+        labels.append(label)
+
+    if len(teams) == 2:
+        st.markdown(f"### {labels[0]} vs {labels[1]}")
+    else:
+        st.markdown(f"### {labels[0]} played alone")
+    cols = st.columns(len(teams))
+    for col, team in zip(cols, teams):
+        with col:
+            if team.avatar:
+                st.image(thumbnail(team.avatar), width=100, caption=team.team_name)
+    st.markdown(f"**Roast:** {roast_text}")
+
+# Function to get a week's live roasts, shared by every viewer of the league and week
+@league_cached(ttl=LIVE_ROASTS_TTL)
+def load_live_roasts(league_id, week):
+    return LiveRoasts()
+
+# Function to roast the live matchups that swung, once per snapshot for all viewers
+def reroast_live_matchups(live_roasts, matchups, scores, team_mapping, threshold=REROAST_MARGIN_THRESHOLD,
+                          is_championship=False, max_in_flight=MAX_IN_FLIGHT):
+    # Another viewer's run may have just roasted these scores
+    swung = live_roasts.swung(matchups, scores, threshold)
+    if swung:
+        roasts = generate_roasts_with_players(swung, team_mapping, is_championship=is_championship, max_in_flight=max_in_flight)
+        live_roasts.record(roasts, scores)
+
+# Function to keep a week's scores updating in place, re-roasting only the matchups
+# whose margin swung past `threshold` or whose lead changed hands since their last roast
+def live_week_view(week, team_mapping, is_championship=False, poll_interval=LIVE_POLL_INTERVAL,
+                   threshold=REROAST_MARGIN_THRESHOLD, max_in_flight=MAX_IN_FLIGHT, league_id=LEAGUE_ID):
+    # Score arrows are per viewer; the roasts themselves are shared across sessions
+    state = st.session_state.setdefault(f"live_week_{league_id}_{week}", {"scores": {}})
+
+    @st.fragment(run_every=poll_interval)
+    def live_scores():
+        matchups = get_matchups_with_teams(week, team_mapping, league_id)
+        if not matchups:
+            return
+
+        scores = snapshot_scores(matchups)
+        deltas = score_deltas(state["scores"], scores)
+        state["scores"] = scores
+
+        live_roasts = load_live_roasts(league_id, week)
+        swung = live_roasts.swung(matchups, scores, threshold)
+        if swung:
+            # Viewers polling the same swing share one generation run
+            swung_scores = tuple((matchup_id, scores[matchup_id]) for matchup_id in swung)
+            single_flight(
+                (league_id, week, "live_roasts", swung_scores, is_championship),
+                reroast_live_matchups,
+                live_roasts, matchups, scores, team_mapping, threshold=threshold,
+                is_championship=is_championship, max_in_flight=max_in_flight
+            )
+
+        st.caption(f"Live: updated {time.strftime('%H:%M:%S')}, checking every {poll_interval} seconds")
+        for matchup_id, teams in matchups.items():
+            render_live_matchup(teams, live_roasts.roast(matchup_id), deltas.get(matchup_id))
+
+    live_scores()
 
 # Main function to run the app
 def main():
+    with collect_spans() as spans:
+        render_roaster()
+    profiler_sidebar(spans)
+
+# Function to render the roaster page
+def render_roaster():
     st.title("Fantasy Football Matchup Roaster 🏈🔥")
+    league_id = select_league(LEAGUE_ID)
+    if league_id is None:
+        return
+    refresh_league_button(league_id)
+    max_in_flight = configure_openai()
+
+    # Dropdown for selecting the week
+    selected_week = st.selectbox(
+        "Select Week:",
+        options=["Regular Season"] + [f"Week {i}" for i in range(1, 16)] + ["Championship"] + [f"Week {i}" for i in range(16, 18)]
+    )
+
+    # Skip the roast cache and ask GPT-4 again for this week
+    force_refresh = st.sidebar.checkbox("Force regenerate roasts")
+
+    # Roast the whole week in a single OpenAI request
+    batch = st.sidebar.checkbox("Batch mode (one request per week)")
+
+    # Keep the selected week's scores updating during games
+    live_mode = st.sidebar.toggle("Live game-day mode")
+    if live_mode:
+        poll_interval = st.sidebar.number_input(
+            "Check scores every (seconds)", min_value=15, value=LIVE_POLL_INTERVAL, step=15
+        )
+        reroast_threshold = st.sidebar.number_input(
+            "Re-roast when the margin swings by (points)", min_value=1.0, value=REROAST_MARGIN_THRESHOLD, step=1.0
+        )
+
+    week = None
+    if selected_week != "Regular Season" and selected_week != "Championship":
+        week = int(selected_week.split(" ")[1])
+        is_championship = week >= 16
+
+        # Warm the GIF pools while rosters, matchups and roasts are fetched
+        gif_api_key = giphy_api_key()
+        if gif_api_key:
+            prefetch_gif_pools(["nfl celebration", "epic fail"], gif_api_key)
+
+        # Weeks precomputed by precompute.py are served straight from disk, without player data
+        artifact = None if force_refresh or live_mode else load_week_artifact(league_id, week)
+        if artifact:
+            matchups, roasts, generated_at = artifact
+            st.caption(f"Precomputed {generated_at}")
+            prefetch_thumbnails(team.avatar for teams in matchups.values() for team in teams)
+            display_matchup_with_logos(matchups, roasts)
+            return
 
     # Load cached player data or fetch if not present
     st.write("Checking for player data...")  # Notify in the app
-    player_data = fetch_and_cache_players()
+    try:
+        player_index = load_player_index()
+    except RuntimeError:
+        player_index = {}
 
-    if player_data:
+    if player_index:
         st.success("Player data loaded successfully.")  # Indicate success in the app
         print("Player data loaded successfully.")  # Log to console
     else:
@@ -236,23 +324,30 @@ def main():
         print("Failed to load player data.")  # Log to console
         return
 
-    # Dropdown for selecting the week
-    selected_week = st.selectbox(
-        "Select Week:",
-        options=["Regular Season"] + [f"Week {i}" for i in range(1, 16)] + ["Championship"] + [f"Week {i}" for i in range(16, 18)]
-    )
+    if week is None:
+        return
 
-    if selected_week != "Regular Season" and selected_week != "Championship":
-        week = int(selected_week.split(" ")[1])
-        is_championship = week >= 16
+    if live_mode:
+        team_mapping = get_team_mapping_with_players(player_index, league_id)
+        if team_mapping:
+            prefetch_thumbnails(team.avatar for team in team_mapping.values())
+            live_week_view(
+                week, team_mapping, is_championship=is_championship, poll_interval=poll_interval,
+                threshold=reroast_threshold, max_in_flight=max_in_flight, league_id=league_id
+            )
+        return
 
-        with st.spinner(f"Fetching data and generating roasts for {selected_week}..."):
-            team_mapping = get_team_mapping_with_players(player_data)
-            if team_mapping:
-                matchups = get_matchups_with_teams(week, team_mapping)
-                if matchups:
-                    roasts = generate_roasts_with_players(matchups, team_mapping, is_championship=is_championship)
-                    display_matchup_with_logos(matchups, roasts)
+    with st.spinner(f"Fetching data and generating roasts for {selected_week}..."):
+        team_mapping = get_team_mapping_with_players(player_index, league_id)
+        if team_mapping:
+            prefetch_thumbnails(team.avatar for team in team_mapping.values())
+            matchups = get_matchups_with_teams(week, team_mapping, league_id)
+            if matchups:
+                stream_matchups_with_logos(
+                    matchups, team_mapping, week=week, is_championship=is_championship,
+                    max_in_flight=max_in_flight, force_refresh=force_refresh, batch=batch,
+                    league_id=league_id
+                )
 
 # Run the app
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+import os
+
+import http_client
+
+# Sleeper API endpoints; the environment overrides point them at local stubs (see loadtest.py)
+SLEEPER_API_URL = os.environ.get("SLEEPER_API_URL", "https://api.sleeper.app/v1")
+SLEEPER_CDN_URL = os.environ.get("SLEEPER_CDN_URL", "https://sleepercdn.com")
+PLAYERS_URL = f"{SLEEPER_API_URL}/players/nfl"
+
+# The player dump is several megabytes, so give it a longer read timeout
+PLAYERS_TIMEOUT = (5, 60)
+
+
+# Function to fetch the users in a league
+def get_users_in_league(league_id):
+    return http_client.get_json(f"{SLEEPER_API_URL}/league/{league_id}/users")
+
+
+# Function to fetch the rosters in a league
+def get_rosters(league_id):
+    return http_client.get_json(f"{SLEEPER_API_URL}/league/{league_id}/rosters")
+
+
+# Function to fetch a league's matchups for a given week
+def get_matchups_for_week(league_id, week):
+    return http_client.get_json(f"{SLEEPER_API_URL}/league/{league_id}/matchups/{week}")
+
+
+# Function to fetch the NFL state (current week and season type)
+def get_nfl_state():
+    return http_client.get_json(f"{SLEEPER_API_URL}/state/nfl")
+
+
+# Function to open a streaming request for the full player dump; `headers` may carry a
+# stored copy's validators (If-None-Match/If-Modified-Since) so an unchanged dump answers 304
+def stream_players(headers=None):
+    return http_client.get_session().get(PLAYERS_URL, headers=headers, timeout=PLAYERS_TIMEOUT, stream=True)
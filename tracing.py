@@ -0,0 +1,184 @@
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+import streamlit as st
+
+# Lightweight timing spans around the slow stages of a page (player load, Sleeper
+# calls, OpenAI, Giphy). Each finished span records its duration, the bytes it
+# moved and whether it was served from a cache. Spans go to three places:
+#   - the page run that opened them (collect_spans), for the sidebar profiler;
+#   - a rolling per-stage window in this process, for p50/p95 across sessions;
+#   - one JSON line each on stderr when SLEEPER_ROASTER_TRACE_LOG=1, for aggregation.
+# Start-up costs (page module imports, the first run of each page) are recorded once
+# per process alongside them, see record_startup.
+
+# Emit one JSON log line per finished span
+TRACE_LOG_ENABLED = os.environ.get("SLEEPER_ROASTER_TRACE_LOG") == "1"
+
+# Finished spans kept per stage for the process-wide percentiles
+TRACE_WINDOW = 500
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_collected = contextvars.ContextVar("collected_spans", default=None)
+_recent = defaultdict(lambda: deque(maxlen=TRACE_WINDOW))
+_recent_lock = threading.Lock()
+_startup = {}
+
+
+class Span:
+    __slots__ = ("name", "attrs", "duration", "bytes", "cache", "error")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.duration = 0.0
+        self.bytes = 0
+        self.cache = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "span": self.name,
+            "ms": round(self.duration * 1000, 1),
+            "bytes": self.bytes,
+            "cache": self.cache,
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+
+def _finish(finished):
+    with _recent_lock:
+        _recent[finished.name].append(finished.duration)
+    spans = _collected.get()
+    if spans is not None:
+        spans.append(finished)
+    if TRACE_LOG_ENABLED:
+        record = {"ts": round(time.time(), 3), "session": _session_id(), **finished.to_dict()}
+        print(json.dumps(record, default=str), file=sys.stderr, flush=True)
+
+
+# Context manager timing a stage, e.g. `with span("sleeper.matchups", week=3) as s:`.
+# Extra keyword arguments are logged with the span.
+@contextlib.contextmanager
+def span(name, **attrs):
+    current = Span(name, attrs)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        _finish(current)
+
+
+# Function to add transferred bytes to the innermost open span, if any
+def add_bytes(count):
+    current = _current_span.get()
+    if current is not None:
+        current.bytes += count
+
+
+# Function to mark the innermost open span as a cache hit or miss, if any
+def mark_cache(hit):
+    current = _current_span.get()
+    if current is not None:
+        current.cache = "hit" if hit else "miss"
+
+
+# Function to record a one-off start-up timing, e.g. a page module's import or its first
+# run after the process started. Only the first value per stage is kept.
+def record_startup(stage, seconds):
+    with _recent_lock:
+        if stage in _startup:
+            return
+        _startup[stage] = seconds
+    if TRACE_LOG_ENABLED:
+        record = {"ts": round(time.time(), 3), "startup": stage, "ms": round(seconds * 1000, 1)}
+        print(json.dumps(record), file=sys.stderr, flush=True)
+
+
+# Function to get {stage: seconds} for the start-up timings recorded in this process
+def startup_timings():
+    with _recent_lock:
+        return dict(_startup)
+
+
+# Context manager collecting the spans finished during a page run, including in
+# worker threads started through roast_engine.run_bounded
+@contextlib.contextmanager
+def collect_spans():
+    spans = []
+    token = _collected.set(spans)
+    try:
+        yield spans
+    finally:
+        _collected.reset(token)
+
+
+def _percentile(durations, fraction):
+    ordered = sorted(durations)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Function to get {stage: (count, p50 seconds, p95 seconds)} over this process's recent spans
+def span_percentiles():
+    with _recent_lock:
+        windows = {name: list(durations) for name, durations in _recent.items() if durations}
+    return {
+        name: (len(durations), _percentile(durations, 0.5), _percentile(durations, 0.95))
+        for name, durations in sorted(windows.items())
+    }
+
+
+# Function to render the optional sidebar timing breakdown for a page run
+def profiler_sidebar(spans):
+    if not st.sidebar.checkbox("Show timing breakdown"):
+        return
+
+    totals = {}
+    for finished in spans:
+        stage = totals.setdefault(finished.name, {"calls": 0, "ms": 0.0, "bytes": 0, "hits": 0})
+        stage["calls"] += 1
+        stage["ms"] += finished.duration * 1000
+        stage["bytes"] += finished.bytes
+        stage["hits"] += finished.cache == "hit"
+
+    st.sidebar.markdown("**This run**")
+    st.sidebar.table([
+        {"stage": name, "calls": stage["calls"], "total ms": round(stage["ms"], 1),
+         "KB": round(stage["bytes"] / 1024, 1), "cache hits": stage["hits"]}
+        for name, stage in sorted(totals.items(), key=lambda item: -item[1]["ms"])
+    ])
+
+    st.sidebar.markdown("**All sessions (recent)**")
+    st.sidebar.table([
+        {"stage": name, "n": count, "p50 ms": round(p50 * 1000, 1), "p95 ms": round(p95 * 1000, 1)}
+        for name, (count, p50, p95) in span_percentiles().items()
+    ])
+
+    startup = startup_timings()
+    if startup:
+        st.sidebar.markdown("**Start-up (this process)**")
+        st.sidebar.table([
+            {"stage": name, "ms": round(seconds * 1000, 1)} for name, seconds in sorted(startup.items())
+        ])
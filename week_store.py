@@ -0,0 +1,40 @@
+import json
+import os
+
+# Directory holding finalized weekly matchup payloads, one subdirectory per league
+WEEK_STORE_DIR = "week_store"
+
+
+class WeekStore:
+    def __init__(self, league_id, root=WEEK_STORE_DIR):
+        self.directory = os.path.join(root, str(league_id))
+
+    def _path(self, week):
+        return os.path.join(self.directory, f"week_{int(week):02d}.json")
+
+    # Function to list the weeks already persisted for this league
+    def stored_weeks(self):
+        if not os.path.isdir(self.directory):
+            return []
+        weeks = []
+        for name in os.listdir(self.directory):
+            if name.startswith("week_") and name.endswith(".json"):
+                weeks.append(int(name[len("week_"):-len(".json")]))
+        return sorted(weeks)
+
+    # Function to load a stored week's raw matchup payload
+    def load(self, week):
+        try:
+            with open(self._path(week), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Function to persist a finalized week's raw matchup payload
+    def save(self, week, matchups):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(week)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(matchups, f)
+        os.replace(tmp_path, path)